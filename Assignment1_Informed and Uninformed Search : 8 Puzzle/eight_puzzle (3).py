@@ -2,32 +2,41 @@
 CSCI 5511- Assignment 1 – 8-Puzzle (Uninformed + Informed Search)
 
 This code covers:
-  - State representation (Tuple of 9 ints; Blank is 0)
+  - State representation (Tuple of rows*cols ints; Blank is 0), packed into one int for the searches
+  - Any board size: 3x3 (the 8-puzzle, default), 4x4 (15-puzzle), 5x5 (24-puzzle) or N x M
   - Visualize State
   - Solvability-check using Parity
-  - Neighbors with action names: "Right", "Left", "Down", "Up"
+  - Neighbors with action names: "Right", "Left", "Down", "Up" (precomputed blank-move tables per size)
   - Path reconstruction function
   - BFS (uninformed, optimal in #moves)
   - DLS + IDDFS (uninformed)
-  - Heuristics: num_wrong_tiles, manhattan_distance
+  - Heuristics: num_wrong_tiles, manhattan_distance, pdb_heuristic (additive pattern databases)
   - A* with either heuristic
-  - Timing + reporting for all four methods
+  - IDA* (in-place board, parent-move pruning)
+  - Solver registry: every search under one interface, solve(name, state, puzzle, heuristic)
+  - Timing + reporting for all methods
 """
 
 
 import sys
+import os
+import mmap
+import math
+import hashlib
 import time
+import json
+import argparse
+import itertools
+import tracemalloc
+import multiprocessing
 from collections import deque
 import heapq
 
 
-# Goal State
+# Goal State (of the 3*3 board; larger boards default to 1, 2, ..., n-1 with the blank last)
 GOAL = (1, 2, 3, 8, 0, 4, 7, 6, 5)
 
-# For fast Manhattan-distance
-GOAL_POS = {tile: divmod(i, 3) for i, tile in enumerate(GOAL)}
-
-############ Input & String to Tuple Conversion 
+############ Input & String to Tuple Conversion
 def parse_state_from_int_string(s: str):
 
     if len(s) != 9 or not s.isdigit():
@@ -38,36 +47,71 @@ def parse_state_from_int_string(s: str):
     return tuple(digits)
 
 
+def read_state(s: str, rows=3, cols=3):
+    # Any size: tiles separated by commas or spaces, row by row. 3*3 also takes the 9-digit form.
+    # Raises ValueError for a bad state (batch input reports it and moves on).
+    n = rows * cols
+    s = s.strip()
+    if n == 9 and s.isdigit():
+        tiles = [int(ch) for ch in s]
+    else:
+        try:
+            tiles = [int(x) for x in s.replace(",", " ").split()]
+        except ValueError:
+            raise ValueError(f"initial state must be {n} numbers separated by commas, like 1,2,3,...,0 (0 = blank)")
+    if sorted(tiles) != list(range(n)):
+        raise ValueError(f"initial state must contain 0 to {n - 1} exactly once")
+    return tuple(tiles)
+
+
+def parse_state(s: str, rows=3, cols=3):
+    if rows * cols == 9 and s.isdigit():
+        return parse_state_from_int_string(s)
+    try:
+        return read_state(s, rows, cols)
+    except ValueError as e:
+        sys.exit(f"Error: {e}.")
 
-############ Visualising TUpple as a table of 3*3
 
-def visualize(state):
-    for i in range(0, 9, 3):
-        row = state[i:i+3]
-        print(" ".join("_" if x == 0 else str(x) for x in row))
+
+############ Visualising TUpple as a table of rows*cols
+
+def visualize(state, cols=3):
+    width = len(str(len(state) - 1))
+    for i in range(0, len(state), cols):
+        row = state[i:i+cols]
+        print(" ".join("_".rjust(width) if x == 0 else str(x).rjust(width) for x in row))
     print()
 
 
 ############ Solvability Check - To check if the initial sequnce in solvable to goal sequence or not
 
-    #For odd-width boards (3*3), initial sate is solvable to goal iff inversion parity matches.
+    #Every move swaps the blank with a tile (one transposition of the whole board, blank included)
+    #and moves the blank one step. So start can reach goal iff the permutation taking start to goal
+    #has the same parity as the blank's Manhattan distance between the two.
     #Implementation:
-    # - Build goal index of each tile (ignore blank 0).
-    # - Map the intial state's tile order to the goal indices (except 0).
-    # - Count inversions in that sequence; solvable iff inv count is even.
+    # - Map each cell of start to the goal index of its tile (blank included).
+    # - Count the transpositions of that permutation: cells minus cycles.
+    # - On odd-width boards (3*3) this is the usual inversion-parity rule.
 
-def is_solvable_with_goal(start, goal):
-    
-    goal_index = {tile: i for i, tile in enumerate(goal) if tile != 0}
-    seq = [goal_index[t] for t in start if t != 0]
+def is_solvable_with_goal(start, goal, cols=3):
 
-    inv = 0
-    # Count pairs (i < j) where seq[i] > seq[j]
-    for i in range(len(seq)):
-        for j in range(i+1, len(seq)):
-            if seq[i] > seq[j]:
-                inv += 1
-    return (inv % 2) == 0
+    goal_index = {tile: i for i, tile in enumerate(goal)}
+    perm = [goal_index[t] for t in start]
+
+    transpositions = 0
+    seen = [False] * len(perm)
+    for i in range(len(perm)):
+        length = 0
+        while not seen[i]:
+            seen[i] = True
+            i = perm[i]
+            length += 1
+        if length:
+            transpositions += length - 1
+    br, bc = divmod(start.index(0), cols)
+    gr, gc = divmod(goal.index(0), cols)
+    return transpositions % 2 == (abs(br - gr) + abs(bc - gc)) % 2
 
 
 
@@ -76,9 +120,10 @@ def is_solvable_with_goal(start, goal):
     #Generate (action, next_state) pairs by sliding a neighbor tile into the blank.
     #         Actions are named by the tile's motion into the blank
 
-def neighbors(state):
+def neighbors(state, cols=3):
     i = state.index(0)              # index of blank
-    r, c = divmod(i, 3)
+    r, c = divmod(i, cols)
+    rows = len(state) // cols
     result = []
 
     def swap(a, b):
@@ -89,14 +134,14 @@ def neighbors(state):
     if c > 0:
         result.append(("Right", swap(i, i - 1)))      # Right
 
-    if c < 2:
+    if c < cols - 1:
         result.append(("Left", swap(i, i + 1)))      # Left
 
     if r > 0:
-        result.append(("Down", swap(i, i - 3)))
+        result.append(("Down", swap(i, i - cols)))
 
-    if r < 2:
-        result.append(("Up", swap(i, i + 3)))
+    if r < rows - 1:
+        result.append(("Up", swap(i, i + cols)))
 
     return result
 
@@ -109,7 +154,7 @@ def reconstruct_actions(parent, end_state):
     s = end_state
     while True:
         prev, act = parent[s]  #parent[state] = (prev_state, action_taken_to_reach_state)
-        if prev is None: 
+        if prev is None:
             break
         actions.append(act)
         s = prev
@@ -117,53 +162,449 @@ def reconstruct_actions(parent, end_state):
     return actions
 
 
+# Undoing a move slides the same tile back the other way
+REVERSE_ACTION = {"Up": "Down", "Down": "Up", "Left": "Right", "Right": "Left"}
+
+
+def splice_actions(parent_f, parent_b, meet):
+    # Path of a bidirectional search: start -> meet from the forward parents, then meet -> goal from the
+    # backward ones, whose parent_b[state] = (next state towards the goal, action that leads there)
+    return reconstruct_actions(parent_f, meet) + reconstruct_actions(parent_b, meet)[::-1]
+
+
+############ Board Sizes : packed states, blank-move tables and heuristics for one rows*cols board
+
+    # The searches work on packed states: one int with cell_bits bits per cell (cell i in bits
+    # cell_bits*i and up; 4 bits up to the 15-puzzle, 5 for the 24-puzzle) and the blank's cell index
+    # above them, from blank_shift. A successor is then a single XOR: the sliding tile leaves its cell
+    # and lands in the blank's (whose bits are 0), and the blank index changes.
+    # get_puzzle(rows, cols) builds each size's tables once.
+
+class SlidingPuzzle:
+
+    def __init__(self, rows, cols, goal=None):
+        self.rows, self.cols = rows, cols
+        self.n = n = rows * cols
+        self.goal = tuple(goal) if goal is not None else tuple(range(1, n)) + (0,)
+        self.cell_bits = max(4, (n - 1).bit_length())
+        self.tile_mask = (1 << self.cell_bits) - 1
+        self.cell_shifts = tuple(self.cell_bits * i for i in range(n))
+        self.blank_shift = n * self.cell_bits
+        self.moves = self.build_move_table()
+        self.goal_packed = self.pack(self.goal)
+
+        goal_pos = {tile: divmod(i, cols) for i, tile in enumerate(self.goal)}
+        # manhattan[tile][cell]: that tile's distance from home (0 for the blank)
+        self.manhattan = [[0] * n] + [[abs(r - goal_pos[tile][0]) + abs(c - goal_pos[tile][1])
+                                       for r, c in (divmod(i, cols) for i in range(n))] for tile in range(1, n)]
+
+        self.patterns = default_patterns(rows, cols)
+        if self.goal == (GOAL if (rows, cols) == (3, 3) else tuple(range(1, n)) + (0,)):
+            name = "eight_puzzle.pdb" if (rows, cols) == (3, 3) else f"puzzle_{rows}x{cols}.pdb"
+        else:   # any other goal gets its own file, so it never overwrites the default one
+            name = f"puzzle_{rows}x{cols}_{hashlib.sha1(bytes(self.goal)).hexdigest()[:12]}.pdb"
+        self.pdb_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+        self.pdb = None
+
+        self.num_wrong_tiles = make_num_wrong_tiles(self)
+        self.manhattan_distance = make_manhattan_distance(self)
+        self.pdb_heuristic = make_pdb_heuristic(self)
+
+    def pack(self, state):
+        p = 0
+        for i, tile in enumerate(state):
+            p |= tile << self.cell_shifts[i]
+        return p | (state.index(0) << self.blank_shift)
+
+    def unpack(self, p):
+        return tuple((p >> shift) & self.tile_mask for shift in self.cell_shifts)
+
+    def build_move_table(self):
+        #moves[blank] = ((action, cell of the tile that slides, its shift, mask of both cells, blank-index XOR), ...)
+        #               in the same order as neighbors()
+        rows, cols, shifts = self.rows, self.cols, self.cell_shifts
+        table = []
+        for b in range(self.n):
+            r, c = divmod(b, cols)
+            moves = []
+            for action, allowed, nb in (("Right", c > 0, b - 1), ("Left", c < cols - 1, b + 1),
+                                        ("Down", r > 0, b - cols), ("Up", r < rows - 1, b + cols)):
+                if allowed:
+                    mask = (1 << shifts[b]) | (1 << shifts[nb])
+                    moves.append((action, nb, shifts[nb], mask, (b ^ nb) << self.blank_shift))
+            table.append(tuple(moves))
+        return tuple(table)
+
+    def packed_neighbors(self, p):    # (action, next_state) pairs, like neighbors() but for packed states
+        tile_mask = self.tile_mask
+        return [(action, p ^ ((p >> shift) & tile_mask) * mask ^ blank_xor)
+                for action, src, shift, mask, blank_xor in self.moves[p >> self.blank_shift]]
+
+    def is_solvable(self, state):
+        return is_solvable_with_goal(tuple(state), self.goal, self.cols)
+
+    def pattern_database(self):
+        # [(pattern, table)] for self.patterns, loaded from pdb_path (built and saved there first if missing)
+        if self.pdb is None:
+            try:
+                self.pdb = load_pdb(self.pdb_path, self)
+            except (OSError, ValueError):
+                tables = [build_pattern_table(pattern, self) for pattern in self.patterns]
+                try:
+                    save_pdb(self.pdb_path, self.patterns, tables, self)
+                    self.pdb = load_pdb(self.pdb_path, self)
+                except OSError:  # read-only directory: keep the tables in memory
+                    self.pdb = list(zip(self.patterns, tables))
+        return self.pdb
+
+
+PUZZLES = {}
+
+def get_puzzle(rows, cols, goal=None):
+    # The SlidingPuzzle for this size (and goal; 3*3 defaults to GOAL), built once
+    if goal is None and (rows, cols) == (3, 3):
+        goal = GOAL
+    key = (rows, cols, tuple(goal) if goal is not None else None)
+    if key not in PUZZLES:
+        PUZZLES[key] = SlidingPuzzle(rows, cols, goal)
+    return PUZZLES[key]
+
+
+def puzzle_for(state, puzzle=None, heuristic_fn=None):
+    # The board a solver works on: puzzle if given, else the heuristic's, else the square board of the state's size
+    if puzzle is None:
+        puzzle = getattr(heuristic_fn, "puzzle", None)
+    if puzzle is None:
+        side = math.isqrt(len(state))
+        if side * side != len(state):
+            raise ValueError(f"a {len(state)}-cell state is not square; pass puzzle=get_puzzle(rows, cols)")
+        puzzle = get_puzzle(side, side)
+    if len(state) != puzzle.n:
+        raise ValueError(f"a {len(state)}-cell state does not fit a {puzzle.rows}x{puzzle.cols} board")
+    return puzzle
+
+
+########     HEURISTICS (FOR A* AND IDA*)
+
+    # Each board size gets its own heuristic functions. A heuristic takes a state (tuple or list) and may
+    # also carry:
+    #   .packed - the same heuristic on a packed state, used by astar() (otherwise the state is unpacked)
+    #   .delta  - incremental form: delta[tile][src][dst] is how h changes when tile slides from cell src
+    #             to cell dst. astar() and ida_star() then compute h once, for the start, and add a delta
+    #             per successor; a heuristic without a delta is evaluated on every successor.
+    #   .puzzle - the SlidingPuzzle it belongs to, so solvers can tell the board size from it
+
+def make_num_wrong_tiles(puzzle):
+    goal, n, shifts, tile_mask = puzzle.goal, puzzle.n, puzzle.cell_shifts, puzzle.tile_mask
+
+    def num_wrong_tiles(state):   ## Heuristic h1: number of tiles out of place.
+        wrong = 0
+        for i, tile in enumerate(state):
+            if tile != 0 and tile != goal[i]:
+                wrong += 1
+        return wrong
+
+    def packed(p):
+        wrong = 0
+        for i, shift in enumerate(shifts):
+            tile = (p >> shift) & tile_mask
+            if tile != 0 and tile != goal[i]:
+                wrong += 1
+        return wrong
+
+    num_wrong_tiles.packed = packed
+    num_wrong_tiles.delta = [[[(tile != 0 and tile != goal[dst]) - (tile != 0 and tile != goal[src])
+                               for dst in range(n)] for src in range(n)] for tile in range(n)]
+    num_wrong_tiles.puzzle = puzzle
+    return num_wrong_tiles
+
+
+def make_manhattan_distance(puzzle):
+    manhattan, n, shifts, tile_mask = puzzle.manhattan, puzzle.n, puzzle.cell_shifts, puzzle.tile_mask
+
+    def manhattan_distance(state):    ##Heuristic h2: sum of |row - goal_row| + |col - goal_col| over the tiles.
+        total = 0
+        for i, tile in enumerate(state):
+            total += manhattan[tile][i]
+        return total
+
+    def packed(p):
+        total = 0
+        for i, shift in enumerate(shifts):
+            total += manhattan[(p >> shift) & tile_mask][i]
+        return total
+
+    manhattan_distance.packed = packed
+    manhattan_distance.delta = [[[manhattan[tile][dst] - manhattan[tile][src]
+                                  for dst in range(n)] for src in range(n)] for tile in range(n)]
+    manhattan_distance.puzzle = puzzle
+    return manhattan_distance
+
+
+def packed_heuristic(heuristic_fn, puzzle):
+    # Any other heuristic_fn (taking a state tuple) still works, on the unpacked state
+    packed = getattr(heuristic_fn, "packed", None)
+    if packed is None:
+        packed = lambda p: heuristic_fn(puzzle.unpack(p))
+    return packed
+
+
+############ Pattern Databases (additive, disjoint)
+
+    # Each pattern is a group of tiles. Its table holds, for every placement of those tiles, the fewest
+    # moves OF THOSE TILES needed to bring them home. Blank moves through other tiles are free, so the
+    # groups' values can be added and the sum is still admissible.
+    # Tables are built by 0-1 BFS backwards from the goal over (pattern cells..., blank cell) and stored as
+    # bytes indexed by rank_cells(cells of the pattern tiles, in pattern order).
+
+PDB_PATTERNS = {(3, 3): ((1, 2, 3, 4), (5, 6, 7, 8))}
+PDB_BUDGET = 1 << 20    # other sizes: groups as large as keeps each BFS (pattern + blank) within this many entries
+PDB_MAGIC = b"SPDB"
+UNSEEN = 255
+
+
+def rank_cells(cells, n=9):
+    # Perfect hash of a sequence of distinct cells: its index among all n*(n-1)*...*(n-k+1) such sequences
+    r = 0
+    for i, c in enumerate(cells):
+        smaller_used = 0
+        for u in cells[:i]:
+            if u < c:
+                smaller_used += 1
+        r = r * (n - i) + c - smaller_used
+    return r
+
+
+def num_placements(k, n=9):
+    total = 1
+    for i in range(k):
+        total *= n - i
+    return total
+
+
+def default_patterns(rows, cols):
+    if (rows, cols) in PDB_PATTERNS:
+        return PDB_PATTERNS[(rows, cols)]
+    n = rows * cols
+    k = 1
+    while k + 1 < n and num_placements(k + 2, n) <= PDB_BUDGET:
+        k += 1
+    tiles = list(range(1, n))
+    return tuple(tuple(tiles[i:i + k]) for i in range(0, n - 1, k))
+
+
+def build_pattern_table(pattern, puzzle):
+    n = puzzle.n
+    adjacent = [[nb for action, nb, shift, mask, blank_xor in puzzle.moves[b]] for b in range(n)]
+    k = len(pattern)
+    start = tuple(puzzle.goal.index(t) for t in pattern) + (puzzle.goal.index(0),)
+    dist = bytearray([UNSEEN]) * num_placements(k + 1, n)
+    table = bytearray([UNSEEN]) * num_placements(k, n)
+    dist[rank_cells(start, n)] = 0
+    q = deque([(0, start)])
+
+    while q:
+        d, cells = q.popleft()
+        if d > dist[rank_cells(cells, n)]:
+            continue  # stale: reached more cheaply later
+        r = rank_cells(cells[:k], n)
+        if d < table[r]:
+            table[r] = d
+        blank = cells[k]
+        for nb in adjacent[blank]:
+            if nb in cells[:k]:    # a pattern tile slides into the blank: costs 1
+                i = cells.index(nb)
+                ncells, nd = cells[:i] + (blank,) + cells[i + 1:k] + (nb,), d + 1
+            else:                  # some other tile slides: free
+                ncells, nd = cells[:k] + (nb,), d
+            nr = rank_cells(ncells, n)
+            if nd < dist[nr]:
+                dist[nr] = nd
+                if nd == d:
+                    q.appendleft((nd, ncells))
+                else:
+                    q.append((nd, ncells))
+    return table
+
+
+def save_pdb(path, patterns, tables, puzzle):
+    # File: magic, rows, cols, goal (n bytes), number of patterns, then each pattern as (k, k tiles), then the tables
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(PDB_MAGIC + bytes([puzzle.rows, puzzle.cols]) + bytes(puzzle.goal) + bytes([len(patterns)]))
+        for pattern in patterns:
+            f.write(bytes([len(pattern)]) + bytes(pattern))
+        for table in tables:
+            f.write(table)
+    os.replace(tmp, path)
+
+
+def load_pdb(path, puzzle):
+    # Returns [(pattern, table)], the tables being read-only views of the memory-mapped file
+    with open(path, "rb") as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    n = puzzle.n
+    if (data[:4] != PDB_MAGIC or tuple(data[4:6]) != (puzzle.rows, puzzle.cols)
+            or tuple(data[6:6 + n]) != puzzle.goal):
+        raise ValueError(f"{path} is not a pattern database for this {puzzle.rows}x{puzzle.cols} goal")
+    view = memoryview(data)
+    count, pos = data[6 + n], 7 + n
+    patterns = []
+    for _ in range(count):
+        k = data[pos]
+        patterns.append(tuple(data[pos + 1:pos + 1 + k]))
+        pos += 1 + k
+    pdb = []
+    for pattern in patterns:
+        size = num_placements(len(pattern), n)
+        pdb.append((pattern, view[pos:pos + size]))
+        pos += size
+    return pdb
+
+
+def make_pdb_heuristic(puzzle):
+    n, shifts, tile_mask = puzzle.n, puzzle.cell_shifts, puzzle.tile_mask
+
+    def pdb_heuristic(state):   ## Heuristic h3: sum of the pattern database values of the tile groups
+        where = [0] * n
+        for i, tile in enumerate(state):
+            where[tile] = i
+        return sum(table[rank_cells([where[t] for t in pattern], n)] for pattern, table in puzzle.pattern_database())
+
+    def packed(p):
+        where = [0] * n
+        for i, shift in enumerate(shifts):
+            where[(p >> shift) & tile_mask] = i
+        return sum(table[rank_cells([where[t] for t in pattern], n)] for pattern, table in puzzle.pattern_database())
+
+    pdb_heuristic.packed = packed
+    pdb_heuristic.puzzle = puzzle
+    return pdb_heuristic
+
+
+# The 8-puzzle's board and heuristics, the defaults everywhere
+EIGHT = get_puzzle(3, 3)
+num_wrong_tiles = EIGHT.num_wrong_tiles
+manhattan_distance = EIGHT.manhattan_distance
+pdb_heuristic = EIGHT.pdb_heuristic
+
+
+def record_stats(stats, expanded, generated):
+    # Solvers take an optional stats dict and fill in the states they expanded and generated
+    # (generated is None for the depth-first searches, which keep no record of them)
+    if stats is not None:
+        stats["expanded"] = expanded
+        stats["generated"] = generated
+
+
 ###############  UnInformed Search
 
 
 ##### BFS ( Uses a queue, a visited set, and a parent map )
 
-def breadth_first(initial_state):
+def breadth_first(initial_state, puzzle=None, stats=None):
 
-    if initial_state == GOAL:
+    puzzle = puzzle_for(initial_state, puzzle)
+    if tuple(initial_state) == puzzle.goal:
         return []
 
-    q = deque([initial_state])
-    visited = {initial_state}
-    parent = {initial_state: (None, None)}  # initial state has no parent/action
+    moves, blank_shift, tile_mask, goal = puzzle.moves, puzzle.blank_shift, puzzle.tile_mask, puzzle.goal_packed
+    start = puzzle.pack(initial_state)
+    q = deque([start])
+    parent = {start: (None, None)}  # initial state has no parent/action; the keys double as the visited set
+    expanded = 0
 
     while q:
         s = q.popleft()
+        expanded += 1
 
-        for action, ns in neighbors(s):
-            if ns in visited:
+        for action, src, shift, mask, blank_xor in moves[s >> blank_shift]:
+            ns = s ^ ((s >> shift) & tile_mask) * mask ^ blank_xor
+            if ns in parent:
                 continue
             parent[ns] = (s, action)
-            if ns == GOAL:
+            if ns == goal:
+                record_stats(stats, expanded, len(parent))
                 return reconstruct_actions(parent, ns)
-            visited.add(ns)
             q.append(ns)
 
+    record_stats(stats, expanded, len(parent))
+    return None
+
+
+##### Bidirectional BFS   : one BFS from the start and one back from the goal, a whole layer at a time
+#####                      from whichever frontier is smaller, until they touch. Each side only goes about
+#####                      half the depth, so far fewer states are stored than breadth_first's parent map
+
+def bidirectional_breadth_first(initial_state, puzzle=None, stats=None):
 
+    puzzle = puzzle_for(initial_state, puzzle)
+    if tuple(initial_state) == puzzle.goal:
+        return []
+    if not puzzle.is_solvable(initial_state):
+        return None     # otherwise one side would visit its whole half of the state space first
+
+    moves, blank_shift, tile_mask = puzzle.moves, puzzle.blank_shift, puzzle.tile_mask
+    start, goal = puzzle.pack(initial_state), puzzle.goal_packed
+    parent_f = {start: (None, None)}
+    parent_b = {goal: (None, None)}    # parent_b[s] = (state one move nearer the goal, action to it)
+    frontier_f, frontier_b = [start], [goal]
+    expanded = 0
+
+    while frontier_f and frontier_b:
+        forward = len(frontier_f) <= len(frontier_b)
+        frontier, parent, other = (frontier_f, parent_f, parent_b) if forward else (frontier_b, parent_b, parent_f)
+        next_frontier = []
+        for s in frontier:
+            expanded += 1
+            for action, src, shift, mask, blank_xor in moves[s >> blank_shift]:
+                ns = s ^ ((s >> shift) & tile_mask) * mask ^ blank_xor
+                if ns in parent:
+                    continue
+                parent[ns] = (s, action) if forward else (s, REVERSE_ACTION[action])
+                if ns in other:
+                    # The first contact is a shortest path: nothing was shared after the previous layer
+                    record_stats(stats, expanded, len(parent_f) + len(parent_b))
+                    return splice_actions(parent_f, parent_b, ns)
+                next_frontier.append(ns)
+        if forward:
+            frontier_f = next_frontier
+        else:
+            frontier_b = next_frontier
+
+    record_stats(stats, expanded, len(parent_f) + len(parent_b))
     return None
 
 
-##### DLS
-def depth_limited_search(state, limit, path_set):
+##### DLS  (state and path_set hold state tuples, or packed states of puzzle, EIGHT by default; stats counts expansions)
+def depth_limited_search(state, limit, path_set, puzzle=EIGHT, stats=None):
+
+    if isinstance(state, int):
+        return packed_depth_limited_search(state, limit, path_set, puzzle, stats)
+    puzzle = puzzle_for(state, puzzle)
+    return packed_depth_limited_search(puzzle.pack(state), limit, {puzzle.pack(s) for s in path_set}, puzzle, stats)
+
+
+def packed_depth_limited_search(state, limit, path_set, puzzle=EIGHT, stats=None):
 
-    if state == GOAL:
+    if state == puzzle.goal_packed:
         return []
 
     if limit == 0:
         return "cutoff"
 
+    if stats is not None:
+        stats["expanded"] += 1
+
     cutoff_happened = False
 
-    for action, ns in neighbors(state):
+    for action, src, shift, mask, blank_xor in puzzle.moves[state >> puzzle.blank_shift]:
+        ns = state ^ ((state >> shift) & puzzle.tile_mask) * mask ^ blank_xor
         if ns in path_set:  # avoid cycles on present path
             continue
 
         path_set.add(ns)
-        result = depth_limited_search(ns, limit - 1, path_set)
+        result = packed_depth_limited_search(ns, limit - 1, path_set, puzzle, stats)
         path_set.remove(ns)
 
         if result == "cutoff":
@@ -177,55 +618,46 @@ def depth_limited_search(state, limit, path_set):
 
 ##### IDDFS   :  Repeatedly run DLS with increasing limit: 0, 1, 2, ...
 
-def iterative_deepening(initial_state):
-
-    # Taking limit cap as 50
-    for limit in range(0, 50):
-        result = depth_limited_search(initial_state, limit, {initial_state})
+def iterative_deepening(initial_state, puzzle=None, max_depth=None, stats=None):
+
+    puzzle = puzzle_for(initial_state, puzzle)
+    if not puzzle.is_solvable(initial_state):
+        return None
+    start = puzzle.pack(initial_state)
+    if stats is not None:
+        stats.update(expanded=0, generated=None)
+    # No cap by default: a solvable start always has a solution at some depth
+    limits = itertools.count() if max_depth is None else range(0, max_depth + 1)
+    for limit in limits:
+        result = packed_depth_limited_search(start, limit, {start}, puzzle, stats)
         if result != "cutoff":  # either found a solution (list) or failed (None)
             return result
     return None
 
 
-########     HEURISTICS (FOR A*)
-
-def num_wrong_tiles(state):   ## Heuristic h1: number of tiles out of place.
-    wrong = 0
-    for i, tile in enumerate(state):
-        if tile != 0 and tile != GOAL[i]:
-            wrong += 1
-    return wrong
-
-
-def manhattan_distance(state):    ##Heuristic h2: sum of |row - goal_row| + |col - goal_col| for tiles 1..8.
-    total = 0
-    for i, tile in enumerate(state):
-        if tile == 0:
-            continue
-        r, c = divmod(i, 3)
-        gr, gc = GOAL_POS[tile]
-        total += abs(r - gr) + abs(c - gc)
-    return total
-
-
 ###############  Informed Search
 
-##### A* SEARCH (WITH EITHER HEURISTIC)   : Priority queue items are (f, g, tie, state)
+##### A* SEARCH (WITH EITHER HEURISTIC)   : Priority queue items are (f, g, tie, packed state)
 
 
-def astar(initial_state, heuristic_fn):
+def astar(initial_state, heuristic_fn, puzzle=None, stats=None):
 
-    if initial_state == GOAL:
+    puzzle = puzzle_for(initial_state, puzzle, heuristic_fn)
+    if tuple(initial_state) == puzzle.goal:
         return []
 
+    moves, blank_shift, tile_mask, goal = puzzle.moves, puzzle.blank_shift, puzzle.tile_mask, puzzle.goal_packed
+    h_fn = packed_heuristic(heuristic_fn, puzzle)
+    delta = getattr(heuristic_fn, "delta", None)
+    start = puzzle.pack(initial_state)
     open_heap = []
     tie = 0
 
-    g_cost = {initial_state: 0}
-    parent = {initial_state: (None, None)}
+    g_cost = {start: 0}
+    parent = {start: (None, None)}
 
-    h0 = heuristic_fn(initial_state)
-    heapq.heappush(open_heap, (h0, 0, tie, initial_state))
+    h0 = h_fn(start)
+    heapq.heappush(open_heap, (h0, 0, tie, start))
 
     closed = set()  # expanded states
 
@@ -236,28 +668,181 @@ def astar(initial_state, heuristic_fn):
             continue
         closed.add(s)
 
-        if s == GOAL:
+        if s == goal:
+            record_stats(stats, len(closed), len(g_cost))
             return reconstruct_actions(parent, s)
 
-        for action, ns in neighbors(s):
+        h = f - g  # the entry carries h(s) as f - g
+        dst = s >> blank_shift
+        for action, src, shift, mask, blank_xor in moves[dst]:
+            tile = (s >> shift) & tile_mask
+            ns = s ^ tile * mask ^ blank_xor
             newg = g + 1  # each move costs 1
             # If ns not seen before, or we found a cheaper path to it, update
             if ns not in g_cost or newg < g_cost[ns]:
                 g_cost[ns] = newg
                 parent[ns] = (s, action)
-                h = heuristic_fn(ns)
+                nh = h_fn(ns) if delta is None else h + delta[tile][src][dst]
                 tie += 1
-                heapq.heappush(open_heap, (newg + h, newg, tie, ns))
+                heapq.heappush(open_heap, (newg + nh, newg, tie, ns))
 
+    record_stats(stats, len(closed), len(g_cost))
     return None
 
 
+##### Bidirectional A* (MM)   : A* from both ends, each side expanding by priority max(f, 2g) so that
+#####                          neither goes past the middle of an optimal path. The best meeting found
+#####                          (cost best) is optimal once best <= the smallest priority left on either side.
+
+def bidirectional_astar(initial_state, heuristic_fn, puzzle=None, stats=None):
+
+    puzzle = puzzle_for(initial_state, puzzle, heuristic_fn)
+    if tuple(initial_state) == puzzle.goal:
+        return []
+    if not puzzle.is_solvable(initial_state):
+        return None
+
+    # The backward search heads for the start: the same heuristic on a board whose goal is the start.
+    # Pattern databases exist only for the standard goals, so that side uses Manhattan distance instead.
+    back = SlidingPuzzle(puzzle.rows, puzzle.cols, initial_state)
+    back_fn = getattr(back, getattr(heuristic_fn, "__name__", ""), None)
+    if back_fn is None or back_fn.__name__ == "pdb_heuristic":
+        back_fn = back.manhattan_distance
+
+    moves, blank_shift, tile_mask = puzzle.moves, puzzle.blank_shift, puzzle.tile_mask
+    start, goal = puzzle.pack(initial_state), puzzle.goal_packed
+    # Per side: [open heap of (priority, g, tie, state, h), g_cost, parent, closed, heuristic, delta]
+    sides = []
+    for root, fn in ((start, heuristic_fn), (goal, back_fn)):
+        h_fn = packed_heuristic(fn, puzzle)
+        h0 = h_fn(root)
+        sides.append([[(h0, 0, 0, root, h0)], {root: 0}, {root: (None, None)}, set(), h_fn, getattr(fn, "delta", None)])
+    tie = 0
+    expanded = 0
+    best, meet = float("inf"), None
+
+    while True:
+        for open_heap, g_cost, parent, closed, h_fn, delta in sides:
+            while open_heap and (open_heap[0][3] in closed or open_heap[0][1] > g_cost[open_heap[0][3]]):
+                heapq.heappop(open_heap)     # stale entry
+        if not sides[0][0] or not sides[1][0]:
+            break
+        forward = sides[0][0][0][0] <= sides[1][0][0][0]
+        if best <= min(sides[0][0][0][0], sides[1][0][0][0]):
+            break
+        open_heap, g_cost, parent, closed, h_fn, delta = sides[0] if forward else sides[1]
+        other_g = sides[1][1] if forward else sides[0][1]
+
+        _, g, _, s, h = heapq.heappop(open_heap)
+        closed.add(s)
+        expanded += 1
+
+        dst = s >> blank_shift
+        for action, src, shift, mask, blank_xor in moves[dst]:
+            tile = (s >> shift) & tile_mask
+            ns = s ^ tile * mask ^ blank_xor
+            newg = g + 1
+            if ns in g_cost and g_cost[ns] <= newg:
+                continue
+            g_cost[ns] = newg
+            parent[ns] = (s, action) if forward else (s, REVERSE_ACTION[action])
+            closed.discard(ns)  # reopened
+            nh = h_fn(ns) if delta is None else h + delta[tile][src][dst]
+            tie += 1
+            heapq.heappush(open_heap, (max(newg + nh, 2 * newg), newg, tie, ns, nh))
+            if ns in other_g and newg + other_g[ns] < best:
+                best, meet = newg + other_g[ns], ns
+
+    record_stats(stats, expanded, len(sides[0][1]) + len(sides[1][1]))
+    if meet is None:
+        return None
+    return splice_actions(sides[0][2], sides[1][2], meet)
+
+
+##### IDA* SEARCH   : depth-first f-bounded searches on one mutable board; each round's bound is the
+#####                smallest f that went over the previous one
+
+def ida_star(initial_state, heuristic_fn=None, puzzle=None, stats=None):
+
+    puzzle = puzzle_for(initial_state, puzzle, heuristic_fn)
+    if heuristic_fn is None:
+        heuristic_fn = puzzle.manhattan_distance
+    if not puzzle.is_solvable(initial_state):
+        return None     # IDA* keeps no visited set, so it would never stop
+
+    moves = puzzle.moves
+    board = list(initial_state)      # heuristics are called on this list when they have no delta
+    goal = list(puzzle.goal)
+    delta = getattr(heuristic_fn, "delta", None)
+    path = []
+    expanded = 0
+
+    def search(blank, prev, g, h, bound):
+        # True once board is the goal (path then holds the actions), else the smallest f above bound
+        nonlocal expanded
+        f = g + h
+        if f > bound:
+            return f
+        if h == 0 and board == goal:
+            return True
+        expanded += 1
+        minimum = float("inf")
+        for action, src, shift, mask, blank_xor in moves[blank]:
+            if src == prev:     # parent-move pruning: never slide straight back
+                continue
+            tile = board[src]
+            board[blank], board[src] = tile, 0
+            nh = h + delta[tile][src][blank] if delta is not None else heuristic_fn(board)
+            path.append(action)
+            t = search(src, blank, g + 1, nh, bound)
+            if t is True:
+                return True
+            path.pop()
+            board[blank], board[src] = 0, tile
+            if t < minimum:
+                minimum = t
+        return minimum
+
+    blank = board.index(0)
+    h0 = bound = heuristic_fn(board)
+    while True:
+        t = search(blank, None, 0, h0, bound)
+        if t is True:
+            record_stats(stats, expanded, None)
+            return path
+        bound = t
+
+
+############ Solver Registry : every search under one interface
+
+    # SOLVERS[name] = (solver function, whether it takes a heuristic). solve() looks the heuristic up
+    # by name on the puzzle, so the same call works for any board size.
+
+SOLVERS = {
+    "bfs": (breadth_first, False),
+    "bibfs": (bidirectional_breadth_first, False),
+    "iddfs": (iterative_deepening, False),
+    "astar": (astar, True),
+    "biastar": (bidirectional_astar, True),
+    "idastar": (ida_star, True),
+}
+HEURISTICS = ("num_wrong_tiles", "manhattan_distance", "pdb_heuristic")
+
+
+def solve(name, initial_state, puzzle=None, heuristic="manhattan_distance", stats=None):
+    puzzle = puzzle_for(initial_state, puzzle)
+    solver, informed = SOLVERS[name]
+    if informed:
+        return solver(initial_state, getattr(puzzle, heuristic), puzzle=puzzle, stats=stats)
+    return solver(initial_state, puzzle=puzzle, stats=stats)
+
+
 ########### Returning Results with time taken
 
-def run_and_report(name, solver_fn, *args):
+def run_and_report(name, solver_fn, *args, **kwargs):
 
     t0 = time.perf_counter()
-    actions = solver_fn(*args)
+    actions = solver_fn(*args, **kwargs)
     t1 = time.perf_counter()
 
     if actions is None:
@@ -269,29 +854,145 @@ def run_and_report(name, solver_fn, *args):
         print(f"{name}: {len(actions)} moves | {moves} | time: {t1 - t0:.4f}s")
 
 
+########### Batch Solving : many start states across a process pool, one JSON line per instance
+
+    # The tables are built (and a pattern database saved) once in the parent; each worker then gets the
+    # board's move tables on start-up and memory-maps the same PDB file, so the OS shares its pages.
+
+_batch = None   # (puzzle, solver name, heuristic, measure memory) in each worker
+
+
+def _init_batch_worker(rows, cols, name, heuristic, memory):
+    global _batch
+    puzzle = get_puzzle(rows, cols)
+    if heuristic == "pdb_heuristic" and SOLVERS[name][1]:    # only informed searches use the heuristic
+        puzzle.pattern_database()
+    _batch = (puzzle, name, heuristic, memory)
+
+
+def _solve_batch_line(job):
+    line_no, text = job
+    puzzle, name, heuristic, memory = _batch
+    record = {"line": line_no}
+    try:
+        state = read_state(text, puzzle.rows, puzzle.cols)
+    except ValueError as e:
+        record["error"] = str(e)
+        return record
+    record["state"] = list(state)
+    if not puzzle.is_solvable(state):
+        record["solvable"] = False
+        return record
+
+    stats = {}
+    if memory:
+        tracemalloc.start()
+    try:
+        t0 = time.perf_counter()
+        actions = solve(name, state, puzzle, heuristic, stats)
+        record["seconds"] = round(time.perf_counter() - t0, 6)
+        if memory:
+            record["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+    finally:
+        if memory:
+            tracemalloc.stop()    # or every later instance in this worker would be traced too
+    record["solvable"] = True
+    record["moves"] = len(actions) if actions is not None else None
+    record["actions"] = actions
+    record["expanded"] = stats.get("expanded")
+    record["generated"] = stats.get("generated")
+    return record
+
+
+def batch_solve(lines, out, rows=3, cols=3, name="idastar", heuristic="manhattan_distance",
+                processes=None, memory=True):
+    # Solves every state in lines (blank lines and # comments skipped) and writes one JSON object per
+    # state to out as soon as it is ready, in input order. peak_kb (tracemalloc's peak for the solve) is
+    # only measured with memory=True, which slows allocation-heavy searches down. Returns the count.
+    puzzle = get_puzzle(rows, cols)
+    if heuristic == "pdb_heuristic" and SOLVERS[name][1]:
+        puzzle.pattern_database()
+    jobs = ((i, line) for i, line in enumerate(lines, 1) if line.strip() and not line.lstrip().startswith("#"))
+    count = 0
+    with multiprocessing.Pool(processes, _init_batch_worker, (rows, cols, name, heuristic, memory)) as pool:
+        for record in pool.imap(_solve_batch_line, jobs, chunksize=16):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            count += 1
+    return count
+
+
 #####   Main
 
+SOLVER_NAMES = {"bfs": "BFS", "bibfs": "BidirectionalBFS", "iddfs": "IterativeDeepening", "astar": "A*",
+                "biastar": "BidirectionalA*", "idastar": "IDA*"}
+
+# What runs when no --solver is given: everything on 3*3; only IDA* with Manhattan distance on larger boards
+DEFAULT_RUNS_3X3 = (("bfs", None), ("bibfs", None), ("iddfs", None), ("astar", "num_wrong_tiles"),
+                    ("astar", "manhattan_distance"), ("astar", "pdb_heuristic"), ("biastar", "manhattan_distance"),
+                    ("idastar", "manhattan_distance"), ("idastar", "pdb_heuristic"))
+DEFAULT_RUNS = (("idastar", "manhattan_distance"),)
+
+
+def parse_size(text):
+    rows, sep, cols = text.lower().partition("x")
+    if not sep or not rows.isdigit() or not cols.isdigit() or int(rows) < 2 or int(cols) < 2:
+        raise argparse.ArgumentTypeError(f"board size must look like 4x4, not {text!r}")
+    return int(rows), int(cols)
+
+
 def main():
-    # Expect exactly one argument: 9-digit initial state, 0 = blank
-    if len(sys.argv) != 2:
-        print("Usage: python eight_puzzle.py <initial_state_as_integer>")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Solve a sliding-tile puzzle (the 3x3 8-puzzle by default).")
+    parser.add_argument("state", nargs="?", help="start state: 9 digits like 120843765 on 3x3, or the tiles "
+                                                 "separated by commas on any size (0 = blank)")
+    parser.add_argument("--size", type=parse_size, default=(3, 3), help="board size ROWSxCOLS, e.g. 4x4")
+    parser.add_argument("--solver", action="append", choices=sorted(SOLVERS),
+                        help="search to run (repeatable); default all of them on 3x3, IDA* on larger boards")
+    parser.add_argument("--heuristic", choices=HEURISTICS, default="manhattan_distance",
+                        help="heuristic for astar/idastar when --solver is given")
+    batch = parser.add_argument_group("batch mode", "solve one state per line with the first --solver "
+                                                    "(default idastar), writing JSON lines")
+    batch.add_argument("--batch", metavar="FILE", help="file of start states, or - for stdin")
+    batch.add_argument("--output", metavar="FILE", help="write the results here instead of stdout")
+    batch.add_argument("--processes", type=int, default=None, help="worker processes (default: one per CPU)")
+    batch.add_argument("--no-memory", dest="memory", action="store_false",
+                       help="skip the per-instance peak memory measurement (faster)")
+    args = parser.parse_args()
+
+    rows, cols = args.size
+    if args.batch:
+        if args.state:
+            parser.error("give either a state or --batch, not both")
+        name = args.solver[0] if args.solver else "idastar"
+        source = sys.stdin if args.batch == "-" else open(args.batch)
+        out = open(args.output, "w") if args.output else sys.stdout
+        t0 = time.perf_counter()
+        with source, out:
+            count = batch_solve(source, out, rows, cols, name, args.heuristic, args.processes, args.memory)
+        print(f"{count} instances in {time.perf_counter() - t0:.2f}s", file=sys.stderr)
+        return
+    if not args.state:
+        parser.error("a start state (or --batch FILE) is required")
 
-    initial = parse_state_from_int_string(sys.argv[1])
+    puzzle = get_puzzle(rows, cols)
+    initial = parse_state(args.state, rows, cols)
 
-    
-    visualize(initial)    ##it will print the 3×3 grid of the start state
+
+    visualize(initial, cols)    ##it will print the grid of the start state
 
     # UNSOLVABLE filter (saves time for impossible pairs)
-    if not is_solvable_with_goal(initial, GOAL):
+    if not puzzle.is_solvable(initial):
         print("This start → goal pair is UNSOLVABLE (different inversion parity).")
         return
 
     # Run Required Searches
-    run_and_report("BFS", breadth_first, initial)
-    run_and_report("IterativeDeepening", iterative_deepening, initial)
-    run_and_report("A* (num_wrong_tiles)", astar, initial, num_wrong_tiles)
-    run_and_report("A* (manhattan_distance)", astar, initial, manhattan_distance)
+    if args.solver:
+        runs = [(name, args.heuristic if SOLVERS[name][1] else None) for name in args.solver]
+    else:
+        runs = DEFAULT_RUNS_3X3 if (rows, cols) == (3, 3) else DEFAULT_RUNS
+    for name, heuristic in runs:
+        label = SOLVER_NAMES[name] + (f" ({heuristic})" if heuristic else "")
+        run_and_report(label, solve, name, initial, puzzle, heuristic)
 
 
 if __name__ == "__main__":
@@ -1,5 +1,4 @@
 import random
-import copy
 
 WHITE = 1
 BLACK = -1
@@ -64,25 +63,156 @@ class HumanPlayer(OthelloPlayerTemplate):
         return curr_move
 
 class RandOthelloState:
-    '''A class to represent an othello game state'''
+    '''A class to represent an othello game state
 
-    def __init__(self, currentplayer, otherplayer, board_array = None, num_skips = 0):
-        if board_array != None:
-            self.board_array = board_array
+    The board is kept as three 64-bit bitboards (white discs, black discs and
+    blocked squares), with square (x, y) of the old board_array at bit x*8 + y.
+    board_array is still accepted by the constructor and can be read back,
+    but only as a tuple of row tuples built from the bitboards, so writing a
+    square in place (state.board_array[x][y] = v, which worked when it was a
+    list of lists) raises TypeError instead of silently doing nothing.
+    Assigning a whole new board_array still works.
+
+    white_count, black_count and empties are the number of white discs, black
+    discs and empty squares. result() carries them over from the previous
+    state instead of counting again; counts, if given, is that triple.
+    '''
+
+    def __init__(self, currentplayer, otherplayer, board_array = None, num_skips = 0, bitboards = None,
+                 counts = None):
+        if bitboards != None:
+            self.white, self.black, self.blocked = bitboards
+        elif board_array != None:
+            self.white, self.black, self.blocked = bitboards_from_array(board_array)
         else:
-            self.board_array = [[EMPTY] * SIZE for i in range(SIZE)]
-            self.board_array[3][3] = WHITE
-            self.board_array[4][4] = WHITE
-            self.board_array[3][4] = BLACK
-            self.board_array[4][3] = BLACK
             x1 = random.randrange(8)
             x2 = random.randrange(8)
-            self.board_array[x1][0] = BLOCKED
-            self.board_array[x2][7] = BLOCKED
+            self.white, self.black, self.blocked = initial_bitboards(x1, x2)
+        if counts == None:
+            counts = (popcount(self.white), popcount(self.black),
+                      popcount(FULL & ~(self.white | self.black | self.blocked)))
+        self.white_count, self.black_count, self.empties = counts
         self.num_skips = num_skips
         self.current = currentplayer
         self.other = otherplayer
 
+    @property
+    def board_array(self):
+        return tuple(map(tuple, array_from_bitboards(self.white, self.black, self.blocked)))
+
+    @board_array.setter
+    def board_array(self, board_array):
+        self.white, self.black, self.blocked = bitboards_from_array(board_array)
+        self.white_count, self.black_count = popcount(self.white), popcount(self.black)
+        self.empties = popcount(FULL & ~(self.white | self.black | self.blocked))
+
+# ---------- Bitboards ----------
+
+FULL = (1 << 64) - 1
+BIT = [[1 << (x * SIZE + y) for y in range(SIZE)] for x in range(SIZE)]
+SQUARES = [(sq // SIZE, sq % SIZE) for sq in range(SIZE * SIZE)]
+COL_0 = sum(BIT[x][0] for x in range(SIZE))
+COL_7 = sum(BIT[x][7] for x in range(SIZE))
+NOT_COL_0 = FULL ^ COL_0
+NOT_COL_7 = FULL ^ COL_7
+
+# (shift, mask) pairs for the eight directions. The mask drops the bits that
+# wrapped around from one row into the next after shifting along y.
+LEFT_SHIFTS = ((1, NOT_COL_0), (SIZE, FULL), (SIZE + 1, NOT_COL_0), (SIZE - 1, NOT_COL_7))
+RIGHT_SHIFTS = ((1, NOT_COL_7), (SIZE, FULL), (SIZE + 1, NOT_COL_7), (SIZE - 1, NOT_COL_0))
+
+try:
+    popcount = int.bit_count
+except AttributeError:  # Python < 3.10
+    def popcount(b):
+        return bin(b).count('1')
+
+def bitboards_from_array(board_array):
+    white = black = blocked = 0
+    for x in range(SIZE):
+        for y in range(SIZE):
+            v = board_array[x][y]
+            if v == WHITE:
+                white |= BIT[x][y]
+            elif v == BLACK:
+                black |= BIT[x][y]
+            elif v == BLOCKED:
+                blocked |= BIT[x][y]
+    return white, black, blocked
+
+def array_from_bitboards(white, black, blocked):
+    board_array = [[EMPTY] * SIZE for i in range(SIZE)]
+    for bb, v in ((white, WHITE), (black, BLACK), (blocked, BLOCKED)):
+        while bb:
+            b = bb & -bb
+            x, y = SQUARES[b.bit_length() - 1]
+            board_array[x][y] = v
+            bb ^= b
+    return board_array
+
+def initial_bitboards(x1, x2):
+    '''Starting (white, black, blocked) with squares (x1, 0) and (x2, 7) blocked'''
+    return BIT[3][3] | BIT[4][4], BIT[3][4] | BIT[4][3], BIT[x1][0] | BIT[x2][7]
+
+def own_and_opp(state, color):
+    '''Returns (discs of color, discs of the other color)'''
+    if color == WHITE:
+        return state.white, state.black
+    return state.black, state.white
+
+def legal_moves(own, opp, blocked):
+    '''Bitboard of the empty squares where own can play against opp
+
+    Each direction is flood-filled through up to six opponent discs starting
+    from own; the empty squares one step past those runs are the legal moves.
+    '''
+    empty = FULL & ~(own | opp | blocked)
+    moves = 0
+    for n, mask in LEFT_SHIFTS:
+        t = opp & mask
+        x = (own << n) & t
+        x |= (x << n) & t
+        x |= (x << n) & t
+        x |= (x << n) & t
+        x |= (x << n) & t
+        x |= (x << n) & t
+        moves |= (x << n) & mask & empty
+    for n, mask in RIGHT_SHIFTS:
+        t = opp & mask
+        x = (own >> n) & t
+        x |= (x >> n) & t
+        x |= (x >> n) & t
+        x |= (x >> n) & t
+        x |= (x >> n) & t
+        x |= (x >> n) & t
+        moves |= (x >> n) & mask & empty
+    return moves
+
+def flips(bit, own, opp):
+    '''Bitboard of the opponent discs flipped by own playing on bit
+
+    Returns 0 when nothing is flipped, i.e. when the move is illegal.
+    '''
+    f = 0
+    for n, mask in LEFT_SHIFTS:
+        x = (bit << n) & mask
+        run = 0
+        while x & opp:
+            run |= x
+            x = (x << n) & mask
+        if x & own:
+            f |= run
+    for n, mask in RIGHT_SHIFTS:
+        x = (bit >> n) & mask
+        run = 0
+        while x & opp:
+            run |= x
+            x = (x >> n) & mask
+        if x & own:
+            f |= run
+    return f
+
+# ---------- Game rules ----------
 
 def player(state):
     return state.current
@@ -90,13 +220,15 @@ def player(state):
 def actions(state):
     '''Return a list of possible actions given the current state
     '''
+    own, opp = own_and_opp(state, state.current.get_color())
+    moves = legal_moves(own, opp, state.blocked)
+    if not moves:
+        return [SKIP]
     legal_actions = []
-    for i in range(SIZE):
-        for j in range(SIZE):
-            if result(state, (i,j)) != None:
-                legal_actions.append((i,j))
-    if len(legal_actions) == 0:
-        legal_actions.append(SKIP)
+    while moves:
+        b = moves & -moves
+        legal_actions.append(SQUARES[b.bit_length() - 1])
+        moves ^= b
     return legal_actions
 
 def result(state, action):
@@ -110,52 +242,35 @@ def result(state, action):
     # first, special case! an action of SKIP is allowed if the current agent has no legal moves
     # in this case, we just skip to the other player's turn but keep the same board
     if action == SKIP:
-        newstate = RandOthelloState(state.other, state.current, copy.deepcopy(state.board_array), state.num_skips + 1)
+        newstate = RandOthelloState(state.other, state.current, num_skips = state.num_skips + 1,
+                                    bitboards = (state.white, state.black, state.blocked),
+                                    counts = (state.white_count, state.black_count, state.empties))
         return newstate
 
-    if state.board_array[action[0]][action[1]] != EMPTY:
+    x, y = action
+    if not (0 <= x < SIZE and 0 <= y < SIZE):
+        return None
+    bit = BIT[x][y]
+    if (state.white | state.black | state.blocked) & bit:
         return None
 
     color = state.current.get_color()
-    # create new state with players swapped and a copy of the current board
-    newstate = RandOthelloState(state.other, state.current, copy.deepcopy(state.board_array))
-
-    newstate.board_array[action[0]][action[1]] = color
-    
-    flipped = False
-    directions = [(-1,-1), (-1,0), (-1,1), (0,-1), (0,1), (1,-1), (1,0), (1,1)]
-    for d in directions:
-        i = 1
-        count = 0
-        while i <= SIZE:
-            x = action[0] + i * d[0]
-            y = action[1] + i * d[1]
-            if x < 0 or x >= SIZE or y < 0 or y >= SIZE:
-                count = 0
-                break
-            elif newstate.board_array[x][y] == -1 * color:
-                count += 1
-            elif newstate.board_array[x][y] == color:
-                break
-            else:
-                count = 0
-                break
-            i += 1
-
-        if count > 0:
-            flipped = True
-
-        for i in range(count):
-            x = action[0] + (i+1) * d[0]
-            y = action[1] + (i+1) * d[1]
-            newstate.board_array[x][y] = color
-
-    if flipped:
-        return newstate
-    else:  
+    own, opp = own_and_opp(state, color)
+    f = flips(bit, own, opp)
+    if not f:
         # if no pieces are flipped, it's not a legal move
         return None
 
+    own |= bit | f
+    opp ^= f
+    n = popcount(f)
+    # create new state with players swapped
+    if color == WHITE:
+        return RandOthelloState(state.other, state.current, bitboards = (own, opp, state.blocked),
+                                counts = (state.white_count + n + 1, state.black_count - n, state.empties - 1))
+    return RandOthelloState(state.other, state.current, bitboards = (opp, own, state.blocked),
+                            counts = (state.white_count - n, state.black_count + n + 1, state.empties - 1))
+
 def terminal_test(state):
     '''Simple terminal test
     '''
@@ -164,18 +279,12 @@ def terminal_test(state):
         return True
 
     # if there are no empty spaces
-    empty_count = 0
-    for i in range(SIZE):
-        for j in range(SIZE):
-            if state.board_array[i][j] == EMPTY:
-                empty_count += 1
-    if empty_count == 0:
-        return True
-    return False
+    return not state.empties
 
 def display(state):
     '''Displays the current state in the terminal window
     '''
+    board = state.board_array
     print('  ', end='')
     for i in range(SIZE):
         print(i,end='')
@@ -183,11 +292,11 @@ def display(state):
     for i in range(SIZE):
         print(i, '', end='')
         for j in range(SIZE):
-            if state.board_array[j][i] == WHITE:
+            if board[j][i] == WHITE:
                 print('W', end='')
-            elif state.board_array[j][i] == BLACK:
+            elif board[j][i] == BLACK:
                 print('B', end='')
-            elif state.board_array[j][i] == BLOCKED:
+            elif board[j][i] == BLOCKED:
                 print('X', end='')
             else:
                 print('-', end='')
@@ -196,14 +305,8 @@ def display(state):
 def display_final(state):
     '''Displays the score and declares a winner (or tie)
     '''
-    wcount = 0
-    bcount = 0
-    for i in range(SIZE):
-        for j in range(SIZE):
-            if state.board_array[i][j] == WHITE:
-                wcount += 1
-            elif state.board_array[i][j] == BLACK:
-                bcount += 1
+    wcount = state.white_count
+    bcount = state.black_count
 
     print("Black: " + str(bcount))
     print("White: " + str(wcount))
@@ -214,11 +317,227 @@ def display_final(state):
     else:
         print("Tie")
 
+# ---------- Zobrist hashing ----------
+
+# Fixed seed so hashes are stable from run to run and never touch the game's
+# random module state.
+_zobrist_rng = random.Random(5511)
+Z_WHITE = [_zobrist_rng.getrandbits(64) for sq in range(SIZE * SIZE)]
+Z_BLACK = [_zobrist_rng.getrandbits(64) for sq in range(SIZE * SIZE)]
+Z_BLOCKED = [_zobrist_rng.getrandbits(64) for sq in range(SIZE * SIZE)]
+Z_FLIP = [w ^ b for w, b in zip(Z_WHITE, Z_BLACK)]
+Z_WHITE_TO_MOVE = _zobrist_rng.getrandbits(64)
+Z_SKIPS = [0, _zobrist_rng.getrandbits(64), _zobrist_rng.getrandbits(64)]
+
+def zobrist_hash(white, black, blocked, color, num_skips):
+    '''Computes the hash of a position from scratch'''
+    h = Z_WHITE_TO_MOVE if color == WHITE else 0
+    h ^= Z_SKIPS[num_skips]
+    for bb, keys in ((white, Z_WHITE), (black, Z_BLACK), (blocked, Z_BLOCKED)):
+        while bb:
+            b = bb & -bb
+            h ^= keys[b.bit_length() - 1]
+            bb ^= b
+    return h
+
+# The eight symmetries of the board as square permutations, identity first:
+# SYMMETRIES[i][sq] is the square that sq is mapped to.
+SYMMETRIES = [tuple(fx * SIZE + fy for fx, fy in (f(x, y) for x, y in SQUARES)) for f in (
+    lambda x, y: (x, y),
+    lambda x, y: (y, SIZE - 1 - x),
+    lambda x, y: (SIZE - 1 - x, SIZE - 1 - y),
+    lambda x, y: (SIZE - 1 - y, x),
+    lambda x, y: (SIZE - 1 - x, y),
+    lambda x, y: (x, SIZE - 1 - y),
+    lambda x, y: (y, x),
+    lambda x, y: (SIZE - 1 - y, SIZE - 1 - x))]
+
+def transform(bb, perm):
+    '''The bitboard bb with every square moved by the permutation perm'''
+    out = 0
+    while bb:
+        b = bb & -bb
+        out |= 1 << perm[b.bit_length() - 1]
+        bb ^= b
+    return out
+
+_blocked_symmetries = {}
+
+def blocked_symmetries(blocked):
+    '''(permutation, inverse) of every non-identity symmetry that maps the blocked squares onto themselves'''
+    syms = _blocked_symmetries.get(blocked)
+    if syms is None:
+        syms = []
+        for perm in SYMMETRIES[1:]:
+            if transform(blocked, perm) == blocked:
+                inverse = [0] * len(perm)
+                for sq, image in enumerate(perm):
+                    inverse[image] = sq
+                syms.append((perm, tuple(inverse)))
+        syms = _blocked_symmetries[blocked] = tuple(syms)
+    return syms
+
+# ---------- Search board (make/unmake) ----------
+
+PASS = -1  # SearchBoard's move for SKIP; real moves are square indices x*8 + y
+
+class SearchBoard:
+    '''A mutable position for the search players
+
+    Moves are square indices (or PASS). apply(move) plays a move for the side
+    to move in place and returns an undo record; undo(record) restores the
+    position exactly as it was before that apply. Records must be undone in
+    reverse order.
+
+    hash is the Zobrist hash of the position as it stands. key is the
+    canonical hash for transposition tables and books: the smallest hash of
+    the position's images under the board symmetries that keep the blocked
+    squares in place (on most layouts there are none and key is hash).
+    key_move and real_move translate moves between the board and the
+    orientation key was taken in.
+
+    The attribute names match RandOthelloState, so terminal_test and the
+    evaluation functions accept either. Of its counts only empties is kept
+    up to date, which is all terminal_test needs.
+    '''
+
+    def __init__(self, white, black, blocked, color, num_skips = 0):
+        self.white = white
+        self.black = black
+        self.blocked = blocked
+        self.color = color
+        self.num_skips = num_skips
+        self.empties = popcount(FULL & ~(white | black | blocked))
+        self.hash = zobrist_hash(white, black, blocked, color, num_skips)
+        self.syms = blocked_symmetries(blocked)
+        self.sym_hashes = tuple(zobrist_hash(transform(white, perm), transform(black, perm), blocked,
+                                             color, num_skips) for perm, inverse in self.syms)
+        self.set_key()
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(state.white, state.black, state.blocked, state.current.get_color(), state.num_skips)
+
+    @property
+    def board_array(self):
+        return tuple(map(tuple, array_from_bitboards(self.white, self.black, self.blocked)))
+
+    def position(self):
+        '''(white, black, blocked, color, num_skips), the arguments that rebuild this board'''
+        return self.white, self.black, self.blocked, self.color, self.num_skips
+
+    def moves(self):
+        '''Legal square indices for the side to move, or [PASS] if there are none'''
+        if self.color == WHITE:
+            moves = legal_moves(self.white, self.black, self.blocked)
+        else:
+            moves = legal_moves(self.black, self.white, self.blocked)
+        if not moves:
+            return [PASS]
+        legal = []
+        while moves:
+            b = moves & -moves
+            legal.append(b.bit_length() - 1)
+            moves ^= b
+        return legal
+
+    def set_key(self):
+        self.key, self.key_sym = self.hash, None
+        for sym, h in zip(self.syms, self.sym_hashes):
+            if h < self.key:
+                self.key, self.key_sym = h, sym
+
+    def key_move(self, move):
+        '''move as seen in the orientation of key'''
+        if self.key_sym is None or move is None or move == PASS:
+            return move
+        return self.key_sym[0][move]
+
+    def real_move(self, move):
+        '''Inverse of key_move: a move stored under key, turned back to this board'''
+        if self.key_sym is None or move is None or move == PASS:
+            return move
+        return self.key_sym[1][move]
+
+    def apply(self, move):
+        h = self.hash
+        old_skips = self.num_skips
+        if move == PASS:
+            record = (PASS, 0, self.num_skips, self.hash, self.sym_hashes, self.key, self.key_sym)
+            h ^= Z_SKIPS[self.num_skips] ^ Z_SKIPS[self.num_skips + 1]
+            self.num_skips += 1
+            f = 0
+        else:
+            bit = 1 << move
+            if self.color == WHITE:
+                f = flips(bit, self.white, self.black)
+                self.white |= bit | f
+                self.black ^= f
+                h ^= Z_WHITE[move]
+            else:
+                f = flips(bit, self.black, self.white)
+                self.black |= bit | f
+                self.white ^= f
+                h ^= Z_BLACK[move]
+            record = (move, f, self.num_skips, self.hash, self.sym_hashes, self.key, self.key_sym)
+            h ^= Z_SKIPS[self.num_skips]
+            self.num_skips = 0
+            self.empties -= 1
+            ff = f
+            while ff:
+                b = ff & -ff
+                h ^= Z_FLIP[b.bit_length() - 1]
+                ff ^= b
+        self.hash = h ^ Z_WHITE_TO_MOVE
+        if self.syms:
+            self.apply_symmetric(move, f, Z_SKIPS[old_skips] ^ Z_SKIPS[self.num_skips] ^ Z_WHITE_TO_MOVE)
+        else:
+            self.key = self.hash
+        self.color = -self.color
+        return record
+
+    def apply_symmetric(self, move, f, common):
+        '''Updates sym_hashes and key for a move; common is the side-to-move and skip part of the change'''
+        keys = Z_WHITE if self.color == WHITE else Z_BLACK
+        hashes = []
+        for (perm, inverse), h in zip(self.syms, self.sym_hashes):
+            h ^= common
+            if move != PASS:
+                h ^= keys[perm[move]]
+                ff = f
+                while ff:
+                    b = ff & -ff
+                    h ^= Z_FLIP[perm[b.bit_length() - 1]]
+                    ff ^= b
+            hashes.append(h)
+        self.sym_hashes = tuple(hashes)
+        self.set_key()
+
+    def undo(self, record):
+        move, f, self.num_skips, self.hash, self.sym_hashes, self.key, self.key_sym = record
+        self.color = -self.color
+        if move != PASS:
+            self.empties += 1
+            bit = 1 << move
+            if self.color == WHITE:
+                self.white ^= bit | f
+                self.black |= f
+            else:
+                self.black ^= bit | f
+                self.white |= f
+
+def to_action(move):
+    '''Converts a SearchBoard move back to an action for result()'''
+    return SKIP if move == PASS else SQUARES[move]
+
 # ---------- Helpers for AI ----------
 
 INF = 10**9
 
 def count_discs(board, color):
+    '''Discs of color on board, a board array (as before) or a RandOthelloState, whose counts are kept'''
+    if isinstance(board, RandOthelloState):
+        return board.white_count if color == WHITE else board.black_count
     c = 0
     for i in range(SIZE):
         for j in range(SIZE):
@@ -237,57 +556,209 @@ WEIGHTS = [
     [ 20, -3,  2,  2,  2,  2, -3, 20],
 ]
 
-def eval_weighted_frontier(state, me):
-    if terminal_test(state):
-        myc = count_discs(state.board_array, me)
-        opc = count_discs(state.board_array, -me)
-        if myc > opc: return 100000
-        if myc < opc: return -100000
-        return 0
+def weight_masks(weights):
+    '''Groups a weight table into (weight, bitboard of squares with that weight) pairs'''
+    masks = {}
+    for x in range(SIZE):
+        for y in range(SIZE):
+            if weights[x][y]:
+                masks[weights[x][y]] = masks.get(weights[x][y], 0) | BIT[x][y]
+    return tuple(masks.items())
 
-    board = state.board_array
-    pos = 0
-    for x in range(8):
-        for y in range(8):
-            if board[x][y] == me:
-                pos += WEIGHTS[x][y]
-            elif board[x][y] == -me:
-                pos -= WEIGHTS[x][y]
+WEIGHTS_FORMAT = 'randothello-weights'
+WEIGHTS_VERSION = 1
 
-    mobility = len(actions_for_eval(state, me)) - len(actions_for_eval(state, -me))
+class EvalWeights:
+    '''The coefficients of weighted_frontier
 
-    dirs = [(-1,-1),(-1,0),(-1,1),(0,-1),(0,1),(1,-1),(1,0),(1,1)]
-    def frontier_count(color):
-        f = 0
-        for x in range(8):
-            for y in range(8):
-                if board[x][y] == color:
-                    for dx,dy in dirs:
-                        nx,ny = x+dx, y+dy
-                        if 0 <= nx < 8 and 0 <= ny < 8 and board[nx][ny] == EMPTY:
-                            f += 1
-                            break
-        return f
+    squares is an 8x8 table like WEIGHTS, mobility and frontier the
+    multipliers of the mobility and frontier disc differences. load() and
+    save() read and write them as a versioned JSON file, as written by
+    tune_weights.
+
+    squares must be the same under all eight board symmetries: positions
+    that are mirror images share transposition table entries (see
+    SearchBoard.key), so they have to evaluate the same. Raises ValueError
+    otherwise.
+    '''
+
+    def __init__(self, squares, mobility = 3, frontier = 2):
+        self.squares = [list(row) for row in squares]
+        flat = [self.squares[x][y] for x, y in SQUARES]
+        for perm in SYMMETRIES[1:]:
+            for sq, image in enumerate(perm):
+                if flat[image] != flat[sq]:
+                    raise ValueError("square weights are not symmetric: %r is %s but %r is %s" % (
+                        SQUARES[sq], flat[sq], SQUARES[image], flat[image]))
+        self.masks = weight_masks(self.squares)
+        self.mobility = mobility
+        self.frontier = frontier
 
-    my_f = frontier_count(me)
-    op_f = frontier_count(-me)
-    return pos + 3*mobility - 2*(my_f - op_f)
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('format') != WEIGHTS_FORMAT or data.get('version') != WEIGHTS_VERSION:
+            raise ValueError("%s is not a version %d weights file" % (path, WEIGHTS_VERSION))
+        return cls(data['squares'], data['mobility'], data['frontier'])
 
-def actions_for_eval(state, as_color):
-    fake_me = OthelloPlayerTemplate(as_color)
-    fake_opp = OthelloPlayerTemplate(-as_color)
-    temp = RandOthelloState(fake_me, fake_opp, copy.deepcopy(state.board_array), state.num_skips)
-    return actions(temp)
+    def save(self, path, **info):
+        '''Writes the weights to path, with any extra info fields alongside'''
+        data = {'format': WEIGHTS_FORMAT, 'version': WEIGHTS_VERSION,
+                'squares': self.squares, 'mobility': self.mobility, 'frontier': self.frontier}
+        data.update(info)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(data, f, indent=1)
+        os.replace(tmp, path)
 
-TT = {}
-def board_key(board, to_move_color, depth):
-    flat = []
-    for x in range(8):
-        for y in range(8):
-            flat.append(str(board[x][y]))
-    return f"{to_move_color}|{depth}|" + ''.join(flat)
+DEFAULT_WEIGHTS = EvalWeights(WEIGHTS)
 
+def eval_weights(weights):
+    '''EvalWeights for a player's weights argument: None (the defaults), a file path or EvalWeights'''
+    if weights is None:
+        return DEFAULT_WEIGHTS
+    if isinstance(weights, str):
+        return EvalWeights.load(weights)
+    return weights
+
+def neighbours(bb):
+    '''Bitboard of every square next to (in any of the eight directions) a square of bb'''
+    n = 0
+    for s, mask in LEFT_SHIFTS:
+        n |= (bb << s) & mask
+    for s, mask in RIGHT_SHIFTS:
+        n |= (bb >> s) & mask
+    return n
+
+def final_score(own, opp):
+    myc, opc = popcount(own), popcount(opp)
+    if myc > opc: return 100000
+    if myc < opc: return -100000
+    return 0
+
+def weighted_frontier(own, opp, blocked, weights = DEFAULT_WEIGHTS):
+    '''Heuristic value of a non-terminal position for the owner of own
+
+    Square weights, plus 3 per move of mobility advantage, minus 2 per
+    frontier disc (a disc next to an empty square) of advantage, with the
+    default weights. A side with no moves counts as having one (its SKIP),
+    as actions() would.
+    '''
+    pos = 0
+    for w, mask in weights.masks:
+        pos += w * (popcount(own & mask) - popcount(opp & mask))
+    mobility = (max(popcount(legal_moves(own, opp, blocked)), 1)
+                - max(popcount(legal_moves(opp, own, blocked)), 1))
+    edge = neighbours(FULL & ~(own | opp | blocked))
+    return pos + weights.mobility*mobility - weights.frontier*(popcount(own & edge) - popcount(opp & edge))
+
+def eval_weighted_frontier(state, me, weights = DEFAULT_WEIGHTS):
+    own, opp = own_and_opp(state, me)
+    if terminal_test(state):
+        return final_score(own, opp)
+    return weighted_frontier(own, opp, state.blocked, weights)
+
+def eval_children_weighted_frontier(board, me, weights = DEFAULT_WEIGHTS):
+    '''Scores every child of a SearchBoard for me in one call
+
+    Returns [(move, value)] in board.moves() order, with the value
+    eval_weighted_frontier would give each child position. Children are
+    built straight from the bitboards, without apply/undo.
+    '''
+    if board.color == WHITE:
+        own, opp = board.white, board.black
+    else:
+        own, opp = board.black, board.white
+    blocked = board.blocked
+    # the heuristic is antisymmetric, so score from the mover's side and flip if needed
+    sign = 1 if board.color == me else -1
+    moves = legal_moves(own, opp, blocked)
+    if not moves:
+        if board.num_skips + 1 == 2 or not FULL & ~(own | opp | blocked):
+            return [(PASS, sign * final_score(own, opp))]
+        return [(PASS, sign * weighted_frontier(own, opp, blocked, weights))]
+    children = []
+    while moves:
+        b = moves & -moves
+        moves ^= b
+        f = flips(b, own, opp)
+        o2, p2 = own | b | f, opp ^ f
+        if FULL & ~(o2 | p2 | blocked):
+            children.append((b.bit_length() - 1, sign * weighted_frontier(o2, p2, blocked, weights)))
+        else:
+            children.append((b.bit_length() - 1, sign * final_score(o2, p2)))
+    return children
+
+# Both are called as (position, color, EvalWeights)
 EVAL = eval_weighted_frontier
+# Batched form of EVAL used at depth-1 nodes; keep the two in agreement
+EVAL_CHILDREN = eval_children_weighted_frontier
+
+# ---------- Transposition table ----------
+
+EXACT, LOWER, UPPER = 0, 1, 2
+
+class TranspositionTable:
+    '''Fixed-size transposition table indexed by SearchBoard.key
+
+    Entries are (key, depth, flag, value, move, generation) tuples, one per
+    slot, with move in the orientation of the key (see
+    SearchBoard.key_move). Values are from the owning player's point of
+    view and flag says whether value is EXACT, a LOWER bound or an UPPER
+    bound. An entry is replaced when it was written by an earlier search
+    (see new_search) or was searched no deeper than the new one.
+    '''
+
+    def __init__(self, size_bits = 18):
+        self.mask = (1 << size_bits) - 1
+        self.slots = [None] * (1 << size_bits)
+        self.generation = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def clear(self):
+        self.slots = [None] * len(self.slots)
+        self.generation = 0
+
+    def probe(self, key):
+        entry = self.slots[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key, depth, flag, value, move):
+        i = key & self.mask
+        old = self.slots[i]
+        if old is None or old[5] != self.generation or depth >= old[1]:
+            self.slots[i] = (key, depth, flag, value, move, self.generation)
+
+def tt_cutoff(entry, depth, alpha, beta):
+    '''Returns the stored value if entry settles a search of (depth, alpha, beta), else None'''
+    if entry is None or entry[1] < depth:
+        return None
+    flag, value = entry[2], entry[3]
+    if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+        return value
+    return None
+
+def bound_flag(value, alpha, beta):
+    '''Flag for a fail-soft value searched with the window (alpha, beta)'''
+    if value <= alpha:
+        return UPPER
+    if value >= beta:
+        return LOWER
+    return EXACT
+
+def hash_move_first(legals, entry, board):
+    '''legals with the move of the board's table entry, if there is one, moved to the front'''
+    if entry is None or entry[4] is None:
+        return legals
+    move = board.real_move(entry[4])
+    if move in legals and legals[0] != move:
+        legals = [move] + [m for m in legals if m != move]
+    return legals
 
 # ---------- Random player ----------
 
@@ -303,214 +774,1659 @@ class RandomPlayer(OthelloPlayerTemplate):
 # ---------- Minimax player (depth-limited) ----------
 
 class MinimaxPlayer(OthelloPlayerTemplate):
-    def __init__(self, mycolor, depth_limit=3):
+    def __init__(self, mycolor, depth_limit=3, stats=None, weights=None):
         self.color = mycolor
         self.depth_limit = depth_limit
+        self.weights = eval_weights(weights)
+        self.tt = TranspositionTable()
+        self.stats = stats
+        self.nodes = 0
     def get_color(self):
         return self.color
     def make_move(self, state):
-        legals = actions(state)
+        self.tt.new_search()
+        self.nodes = 0
+        board = SearchBoard.from_state(state)
+        if self.stats is not None:
+            self.stats.start_move(self.color)
+            self.stats.start_iteration(0)
+        legals = board.moves()
         best_move = legals[0]
         best_val = -INF
         for mv in legals:
-            s2 = result(state, mv)
-            if s2 is None:
-                continue
-            val = self.min_value(s2, self.depth_limit - 1)
+            undo = board.apply(mv)
+            val = self.min_value(board, self.depth_limit - 1)
+            board.undo(undo)
             if val > best_val:
                 best_val = val
                 best_move = mv
-        return best_move
-    def max_value(self, state, depth):
-        if terminal_test(state) or depth == 0:
-            k = board_key(state.board_array, state.current.get_color(), depth)
-            if k in TT: return TT[k]
-            v = EVAL(state, self.color); TT[k] = v; return v
+        if self.stats is not None:
+            self.stats.end_iteration(self.depth_limit, self.nodes, best_val)
+            self.stats.end_move(best_move, self.nodes)
+        return to_action(best_move)
+    def leaf_value(self, board, depth):
+        entry = self.tt.probe(board.key)
+        if self.stats is not None: self.stats.probe(entry)
+        if entry is not None and entry[1] >= depth: return entry[3]
+        if self.stats is not None: self.stats.leaf_evals += 1
+        v = EVAL(board, self.color, self.weights)
+        self.tt.store(board.key, depth, EXACT, v, None)
+        return v
+    def max_value(self, board, depth):
+        self.nodes += 1
+        if terminal_test(board) or depth == 0:
+            return self.leaf_value(board, depth)
+        entry = self.tt.probe(board.key)
+        if self.stats is not None: self.stats.probe(entry)
+        if entry is not None and entry[1] >= depth: return entry[3]
         v = -INF
-        for mv in actions(state):
-            s2 = result(state, mv)
-            if s2 is None: continue
-            v = max(v, self.min_value(s2, depth - 1))
+        best = None
+        for mv in board.moves():
+            undo = board.apply(mv)
+            val = self.min_value(board, depth - 1)
+            board.undo(undo)
+            if val > v: v, best = val, mv
+        self.tt.store(board.key, depth, EXACT, v, board.key_move(best))
         return v
-    def min_value(self, state, depth):
-        if terminal_test(state) or depth == 0:
-            k = board_key(state.board_array, state.current.get_color(), depth)
-            if k in TT: return TT[k]
-            v = EVAL(state, self.color); TT[k] = v; return v
+    def min_value(self, board, depth):
+        self.nodes += 1
+        if terminal_test(board) or depth == 0:
+            return self.leaf_value(board, depth)
+        entry = self.tt.probe(board.key)
+        if self.stats is not None: self.stats.probe(entry)
+        if entry is not None and entry[1] >= depth: return entry[3]
         v = INF
-        for mv in actions(state):
-            s2 = result(state, mv)
-            if s2 is None: continue
-            v = min(v, self.max_value(s2, depth - 1))
+        best = None
+        for mv in board.moves():
+            undo = board.apply(mv)
+            val = self.max_value(board, depth - 1)
+            board.undo(undo)
+            if val < v: v, best = val, mv
+        self.tt.store(board.key, depth, EXACT, v, board.key_move(best))
         return v
 
 # ---------- Alpha-Beta player (iterative deepening) ----------
 
 import time
 
+class SearchTimeout(Exception):
+    '''Raised from inside the search tree once the time budget is spent'''
+
+ASPIRATION_WINDOW = 25  # half-width of the first window around the previous depth's score
+ENDGAME_EMPTIES = 8      # hand positions with this many empty squares or fewer to EndgameSolver
+ENDGAME_SECONDS = 0.1    # the solver's limit for players without a time budget
+TIME_MARGIN = 0.05       # part of time_budget held back for the last clock check and for returning the move
+
 class AlphabetaPlayer(OthelloPlayerTemplate):
-    def __init__(self, mycolor, depth_limit=4):
+    '''Alpha-beta with iterative deepening under a wall-clock budget
+
+    Each make_move searches depth 1, 2, ... up to depth_limit. The clock is
+    checked every CHECK_EVERY nodes inside the recursion and after every
+    EVAL_CHILDREN batch; when the budget (less TIME_MARGIN of it, so the
+    move comes back within time_budget) runs out the unfinished depth is
+    abandoned and the move from the last completed depth is played. Iterations after the first use an aspiration
+    window around the previous score, and the previous best move is searched
+    first at the root (hash moves do the same below the root). Nodes one ply
+    above the horizon score all their children in one EVAL_CHILDREN call.
+
+    Once endgame_empties or fewer squares are empty the move comes from the
+    exact EndgameSolver instead, if it finishes within half of the budget
+    (or within ENDGAME_SECONDS when there is no budget).
+    book (an OpeningBook or the path of one) is consulted before any search.
+
+    With workers > 1 the root is searched by a process pool instead, see
+    ParallelSearch for the 'split' and 'lazy' modes. Call close() to shut the
+    pool down when the player is no longer needed.
+
+    With ponder=True a helper process keeps searching while the opponent
+    thinks (see Ponderer). The player's transposition table is then shared
+    with it, so everything it finds is in the table when the real reply
+    arrives, and a search it finished for that reply is carried on from the
+    next depth instead of starting over.
+
+    stats, a SearchStats, records what every move's search did. weights (an
+    EvalWeights or the path of a weights file) replaces the default
+    evaluation weights.
+    '''
+    CHECK_EVERY = 32  # nodes between clock checks, must be a power of two
+
+    def __init__(self, mycolor, depth_limit=4, time_budget=1.5, workers=1, parallel='split',
+                 endgame_empties=ENDGAME_EMPTIES, book=None, stats=None, ponder=False, weights=None):
         self.color = mycolor
         self.depth_limit = depth_limit
+        self.weights = eval_weights(weights)
+        self.time_budget = time_budget
+        self.endgame_empties = endgame_empties
+        self.book = OpeningBook(book) if isinstance(book, str) else book
+        self.workers = workers
+        self.parallel = parallel
+        self.pool = None
+        self.ponderer = Ponderer(self) if ponder else None
+        self.tt = self.ponderer.tt if ponder else TranspositionTable()
+        self.stats = stats
+        self.stop = None  # a shared flag that also ends the search when set, see Ponderer
+        self.pondered = {}
+        self.nodes = 0
     def get_color(self):
         return self.color
+    def start_search(self, started=None):
+        '''Resets the per-move state; the budget runs from started (a time.perf_counter() value, default now)'''
+        if started is None:
+            started = time.perf_counter()
+        self.deadline = INF if self.time_budget is None else started + self.time_budget * (1 - TIME_MARGIN)
+        if self.ponderer is not None:
+            self.deadline -= 2 * self.ponderer.overhead  # ponderer.start() still has to run after the search
+        self.nodes = 0
+        self.tt.new_search()
     def make_move(self, state):
-        start = time.time()
-        time_budget = 1.5
-        legals_root = actions(state)
-        if not legals_root: return SKIP
-        best_move = legals_root[0]
-        best_val = -INF
-        for d in range(2, self.depth_limit + 1):
-            alpha, beta = -INF, INF
-            cur_best, cur_val = best_move, -INF
-            for mv in legals_root:
-                s2 = result(state, mv)
-                if s2 is None: continue
-                val = self.min_value(s2, d - 1, alpha, beta)
-                if val > cur_val:
-                    cur_val = val
-                    cur_best = mv
-                if time.time() - start > time_budget:
-                    break
-            if cur_val > best_val:
-                best_val, best_move = cur_val, cur_best
-            if time.time() - start > time_budget:
+        started = time.perf_counter()
+        self.pondered = {} if self.ponderer is None else self.ponderer.stop()
+        self.start_search(started)
+        board = SearchBoard.from_state(state)
+        position = board.position()
+        if self.stats is not None:
+            self.stats.start_move(self.color)
+        move = self.choose_move(board)
+        if self.stats is not None:
+            self.stats.end_move(move, self.nodes)
+        if self.ponderer is not None:
+            self.ponderer.start(position, move)
+        return to_action(move)
+    def choose_move(self, board):
+        legals = board.moves()
+        if len(legals) == 1:
+            if self.stats is not None: self.stats.source = 'forced'
+            return legals[0]
+        move = self.book_move(board, legals)
+        if move is None:
+            move = self.endgame_move(board)
+        if move is not None:
+            return move
+        if self.workers > 1:
+            return self.parallel_move(board, legals)
+        found = self.pondered_search(board, legals)
+        if found is not None:
+            done, mv = found
+            if self.stats is not None:
+                self.stats.source = 'ponder'
+                self.stats.pondered_depth = done
+            if done >= self.depth_limit:
+                return mv
+            depth, val, move = self.iterative_deepening(board, [mv] + [m for m in legals if m != mv], done + 1)
+            return move
+        depth, val, move = self.iterative_deepening(board, legals)
+        return move
+    def pondered_search(self, board, legals):
+        '''(depth, move) of the pondering search of this very position, if it finished one'''
+        found = self.pondered.get(board.hash)
+        if found is None or found[0] == 0 or found[1] not in legals:
+            return None
+        return found
+    def iterative_deepening(self, board, legals, first_depth=1):
+        '''Returns (depth, value, move) of the deepest search finished in time
+
+        depth is 0 (and move is legals[0]) if not even the first one finished.
+        '''
+        best_move, best_val, done = legals[0], None, 0
+        for d in range(first_depth, self.depth_limit + 1):
+            if self.stats is not None:
+                self.stats.start_iteration(self.nodes)
+            try:
+                val, mv = self.search_root(board, legals, d, best_val)
+            except SearchTimeout:
+                # the board was left mid-tree, but it is not used again
+                break
+            if self.stats is not None:
+                self.stats.end_iteration(d, self.nodes, val)
+            best_val, best_move, done = val, mv, d
+            legals = [mv] + [m for m in legals if m != mv]
+        return done, best_val, best_move
+    def book_move(self, board, legals):
+        '''The opening book's move for board, if there is a book and it knows the position'''
+        if self.book is None:
+            return None
+        move = board.real_move(self.book.lookup(board.key))
+        if move not in legals:
+            return None
+        if self.stats is not None: self.stats.source = 'book'
+        return move
+    def endgame_move(self, board):
+        '''The solver's move once few enough squares are empty, else None'''
+        if board.empties > self.endgame_empties:
+            return None
+        own, opp = own_and_opp(board, board.color)
+        now = time.perf_counter()
+        solver = EndgameSolver(now + (ENDGAME_SECONDS if self.deadline == INF else (self.deadline - now) / 2))
+        try:
+            score, move = solver.solve(own, opp, board.blocked, board.num_skips == 1)
+        except SearchTimeout:
+            return None
+        finally:
+            self.nodes += solver.nodes
+        if self.stats is not None: self.stats.source = 'endgame'
+        return move
+    def parallel_move(self, board, legals):
+        pool = self.parallel_search()
+        nodes = pool.nodes
+        if self.parallel == 'lazy':
+            move = pool.lazy_search(board, legals, self.deadline)
+            self.nodes += pool.nodes - nodes
+            return move
+        best_move = legals[0]
+        for d in range(1, self.depth_limit + 1):
+            if time.perf_counter() > self.deadline:
+                break
+            if self.stats is not None:
+                self.stats.start_iteration(self.nodes)
+            found = pool.split_search(board, legals, d, self.deadline)
+            self.nodes += pool.nodes - nodes
+            nodes = pool.nodes
+            if found is None:
                 break
+            if self.stats is not None:
+                self.stats.end_iteration(d, self.nodes, found[0])
+            best_move = found[1]
+            legals = [best_move] + [m for m in legals if m != best_move]
         return best_move
-    def max_value(self, state, depth, alpha, beta):
-        if terminal_test(state) or depth == 0:
-            k = board_key(state.board_array, state.current.get_color(), depth)
-            if k in TT: return TT[k]
-            v = EVAL(state, self.color); TT[k] = v; return v
+    def parallel_search(self):
+        if self.pool is None:
+            self.pool = ParallelSearch(self, self.workers, self.parallel)
+        return self.pool
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+        if self.ponderer is not None:
+            self.ponderer.close()
+    def search_root(self, board, legals, depth, prev_val):
+        '''Searches one depth, starting with an aspiration window around prev_val'''
+        if prev_val is not None and abs(prev_val) < 100000:
+            alpha, beta = prev_val - ASPIRATION_WINDOW, prev_val + ASPIRATION_WINDOW
+            val, mv = self.root_value(board, legals, depth, alpha, beta)
+            if alpha < val < beta:
+                return val, mv
+        return self.root_value(board, legals, depth, -INF, INF)
+    def root_value(self, board, legals, depth, alpha, beta):
+        self.root_depth = depth
+        alpha0 = alpha
         v = -INF
-        for mv in actions(state):
-            s2 = result(state, mv)
-            if s2 is None: continue
-            v = max(v, self.min_value(s2, depth - 1, alpha, beta))
-            if v >= beta: return v
+        best = legals[0]
+        for mv in legals:
+            undo = board.apply(mv)
+            val = self.min_value(board, depth - 1, alpha, beta)
+            board.undo(undo)
+            if val > v: v, best = val, mv
+            if v >= beta: break
             if v > alpha: alpha = v
+        self.tt.store(board.key, depth, bound_flag(v, alpha0, beta), v, board.key_move(best))
+        return v, best
+    def ordered_moves(self, board, entry, depth):
+        '''Moves of an interior node with depth plies left, in the order they are searched'''
+        return hash_move_first(board.moves(), entry, board)
+    def on_cutoff(self, board, move, depth):
+        '''Called when move caused a beta (or, at a min node, alpha) cutoff'''
+    def tick(self):
+        self.nodes += 1
+        if not self.nodes & (self.CHECK_EVERY - 1):
+            self.check_clock()
+    def check_clock(self):
+        if time.perf_counter() > self.deadline or self.stop is not None and self.stop.value:
+            raise SearchTimeout()
+    def leaf_value(self, board, depth, alpha, beta):
+        entry = self.tt.probe(board.key)
+        if self.stats is not None: self.stats.probe(entry)
+        v = tt_cutoff(entry, depth, alpha, beta)
+        if v is not None: return v
+        if self.stats is not None: self.stats.leaf_evals += 1
+        v = EVAL(board, self.color, self.weights)
+        self.tt.store(board.key, depth, EXACT, v, None)
         return v
-    def min_value(self, state, depth, alpha, beta):
-        if terminal_test(state) or depth == 0:
-            k = board_key(state.board_array, state.current.get_color(), depth)
-            if k in TT: return TT[k]
-            v = EVAL(state, self.color); TT[k] = v; return v
+    def max_value(self, board, depth, alpha, beta):
+        self.tick()
+        if terminal_test(board) or depth == 0:
+            return self.leaf_value(board, depth, alpha, beta)
+        entry = self.tt.probe(board.key)
+        if self.stats is not None: self.stats.probe(entry)
+        v = tt_cutoff(entry, depth, alpha, beta)
+        if v is not None: return v
+        if depth == 1:
+            children = EVAL_CHILDREN(board, self.color, self.weights)
+            self.check_clock()  # tick() does not count the batched leaves, so check after every batch
+            if self.stats is not None:
+                self.stats.leaf_evals += len(children)
+                self.stats.batched += len(children)
+            best, v = max(children, key=lambda child: child[1])
+            self.tt.store(board.key, 1, EXACT, v, board.key_move(best))
+            return v
+        alpha0 = alpha
+        v = -INF
+        best = None
+        for i, mv in enumerate(self.ordered_moves(board, entry, depth)):
+            undo = board.apply(mv)
+            val = self.min_value(board, depth - 1, alpha, beta)
+            board.undo(undo)
+            if val > v: v, best = val, mv
+            if v >= beta:
+                if self.stats is not None: self.stats.cutoff(i)
+                self.on_cutoff(board, mv, depth)
+                break
+            if v > alpha: alpha = v
+        self.tt.store(board.key, depth, bound_flag(v, alpha0, beta), v, board.key_move(best))
+        return v
+    def min_value(self, board, depth, alpha, beta):
+        self.tick()
+        if terminal_test(board) or depth == 0:
+            return self.leaf_value(board, depth, alpha, beta)
+        entry = self.tt.probe(board.key)
+        if self.stats is not None: self.stats.probe(entry)
+        v = tt_cutoff(entry, depth, alpha, beta)
+        if v is not None: return v
+        if depth == 1:
+            children = EVAL_CHILDREN(board, self.color, self.weights)
+            self.check_clock()  # tick() does not count the batched leaves, so check after every batch
+            if self.stats is not None:
+                self.stats.leaf_evals += len(children)
+                self.stats.batched += len(children)
+            best, v = min(children, key=lambda child: child[1])
+            self.tt.store(board.key, 1, EXACT, v, board.key_move(best))
+            return v
+        beta0 = beta
         v = INF
-        for mv in actions(state):
-            s2 = result(state, mv)
-            if s2 is None: continue
-            v = min(v, self.max_value(s2, depth - 1, alpha, beta))
-            if v <= alpha: return v
+        best = None
+        for i, mv in enumerate(self.ordered_moves(board, entry, depth)):
+            undo = board.apply(mv)
+            val = self.max_value(board, depth - 1, alpha, beta)
+            board.undo(undo)
+            if val < v: v, best = val, mv
+            if v <= alpha:
+                if self.stats is not None: self.stats.cutoff(i)
+                self.on_cutoff(board, mv, depth)
+                break
             if v < beta: beta = v
+        self.tt.store(board.key, depth, bound_flag(v, alpha, beta0), v, board.key_move(best))
         return v
 
 # ---------- Advanced player: alpha-beta + improved move ordering ----------
 
-class AdvancedPlayer(OthelloPlayerTemplate):
-    def __init__(self, mycolor, depth_limit=5):
-        self.color = mycolor
-        self.depth_limit = depth_limit
-    def get_color(self):
-        return self.color
-    def order_moves(self, state, legals):
+CORNERS = {0, 7, 56, 63}
+# Static move ordering prior: the square's weight in the positional table
+SQUARE_PRIOR = [WEIGHTS[x][y] for x, y in SQUARES]
+
+class AdvancedPlayer(AlphabetaPlayer):
+    '''Fixed-depth alpha-beta with a move ordering subsystem
+
+    The root and nodes fewer than MOBILITY_PLIES below it order moves by
+    corners first, then by the opponent's mobility after the move
+    (order_moves); those orders are cached by position hash for the rest of
+    the search. Deeper nodes skip that probe: they try the killer moves of
+    their ply first, then the rest by history score, with the square's
+    WEIGHTS value as a static prior between equal scores. The hash move goes
+    first everywhere.
+    '''
+    MOBILITY_PLIES = 2
+    MAX_PLY = SIZE * SIZE
+
+    def __init__(self, mycolor, depth_limit=5, workers=1, parallel='split', endgame_empties=ENDGAME_EMPTIES,
+                 book=None, stats=None, ponder=False, weights=None):
+        super().__init__(mycolor, depth_limit, time_budget=None, workers=workers, parallel=parallel,
+                         endgame_empties=endgame_empties, book=book, stats=stats, ponder=ponder,
+                         weights=weights)
+        self.history = [0] * (2 * SIZE * SIZE)  # indexed by square, + 64 for White
+        self.killers = [[None, None] for ply in range(self.MAX_PLY)]
+        self.mobility_orders = {}
+    def start_search(self, started=None):
+        super().start_search(started)
+        # keep some history from the previous move, but let it fade
+        self.history = [h >> 2 for h in self.history]
+        self.killers = [[None, None] for ply in range(self.MAX_PLY)]
+        self.mobility_orders = {}
+    def order_moves(self, board, legals):
         if len(legals) <= 1:
             return legals
-        corners = {(0,0),(0,7),(7,0),(7,7)}
         def opp_mobility_after(move):
-            s2 = result(state, move)
-            if s2 is None: return 999
-            return len(actions(s2))
-        no_skip = [m for m in legals if m != SKIP]
-        corner_moves = [m for m in no_skip if m in corners]
-        others = [m for m in no_skip if m not in corners]
+            undo = board.apply(move)
+            n = len(board.moves())
+            board.undo(undo)
+            return n
+        no_skip = [m for m in legals if m != PASS]
+        corner_moves = [m for m in no_skip if m in CORNERS]
+        others = [m for m in no_skip if m not in CORNERS]
         others.sort(key=opp_mobility_after)
         ordered = corner_moves + others
         return ordered if ordered else legals
-    def make_move(self, state):
-        legals = actions(state)
-        if not legals: return SKIP
-        legals = self.order_moves(state, legals)
+    def ordered_moves(self, board, entry, depth):
+        legals = board.moves()
+        if len(legals) > 1:
+            ply = self.root_depth - depth
+            if ply < self.MOBILITY_PLIES:
+                ordered = self.mobility_orders.get(board.hash)
+                if ordered is None:
+                    ordered = self.mobility_orders[board.hash] = self.order_moves(board, legals)
+                legals = ordered
+            else:
+                killers = self.killers[ply]
+                history = self.history
+                side = SIZE * SIZE if board.color == WHITE else 0
+                legals = sorted(legals, reverse=True,
+                                key=lambda m: (m in killers, history[side + m], SQUARE_PRIOR[m]))
+        return hash_move_first(legals, entry, board)
+    def on_cutoff(self, board, move, depth):
+        if move == PASS:
+            return
+        self.history[(SIZE * SIZE if board.color == WHITE else 0) + move] += depth * depth
+        killers = self.killers[self.root_depth - depth]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+    def choose_move(self, board):
+        legals = self.order_moves(board, board.moves())
+        if len(legals) == 1:
+            if self.stats is not None: self.stats.source = 'forced'
+            return legals[0]
+        move = self.book_move(board, legals)
+        if move is None:
+            move = self.endgame_move(board)
+        if move is not None:
+            return move
+        found = self.pondered_search(board, legals)
+        if found is not None and found[0] >= self.depth_limit:
+            if self.stats is not None:
+                self.stats.source = 'ponder'
+                self.stats.pondered_depth = found[0]
+            return found[1]
+        if self.stats is not None:
+            self.stats.start_iteration(self.nodes)
+        if self.workers > 1:
+            pool = self.parallel_search()
+            nodes = pool.nodes
+            if self.parallel == 'lazy':
+                move = pool.lazy_search(board, legals, self.deadline)
+            else:
+                best_val, move = pool.split_search(board, legals, self.depth_limit, self.deadline)
+            self.nodes += pool.nodes - nodes
+            if self.stats is not None and self.parallel != 'lazy':
+                self.stats.end_iteration(self.depth_limit, self.nodes, best_val)
+            return move
+        self.root_depth = self.depth_limit
         best_move = legals[0]
         alpha = -INF
         beta = INF
         best_val = -INF
         for mv in legals:
-            s2 = result(state, mv)
-            if s2 is None: continue
-            val = self.min_value(s2, self.depth_limit - 1, alpha, beta)
+            undo = board.apply(mv)
+            val = self.min_value(board, self.depth_limit - 1, alpha, beta)
+            board.undo(undo)
             if val > best_val:
                 best_val = val
                 best_move = mv
             if best_val > alpha:
                 alpha = best_val
+        if self.stats is not None:
+            self.stats.end_iteration(self.depth_limit, self.nodes, best_val)
         return best_move
-    def max_value(self, state, depth, alpha, beta):
-        if terminal_test(state) or depth == 0:
-            k = board_key(state.board_array, state.current.get_color(), depth)
-            if k in TT: return TT[k]
-            v = EVAL(state, self.color); TT[k] = v; return v
+
+# ---------- Search statistics ----------
+
+import json
+
+def effective_branching_factor(nodes, depth):
+    '''b such that a uniform tree of this depth, 1 + b + ... + b^depth, has nodes + 1 nodes'''
+    if depth <= 0 or nodes <= depth:
+        return None
+    lo, hi = 1.0, float(nodes)
+    for i in range(60):
+        b = (lo + hi) / 2
+        if (b ** (depth + 1) - 1) / (b - 1) < nodes + 1:
+            lo = b
+        else:
+            hi = b
+    return (lo + hi) / 2
+
+class SearchStats:
+    '''Collects what a player's searches did, one record per move
+
+    Pass one as stats= to MinimaxPlayer, AlphabetaPlayer or AdvancedPlayer.
+    A move's record has the nodes visited (counting the children that
+    depth-1 nodes score in one batch), leaf evaluations, transposition table
+    probes and hits, cutoffs counted by the index of the move that caused
+    them (index 0 means the first move tried was good enough), the depth
+    reached, the effective branching factor of the deepest iteration and the
+    depth, nodes, seconds and value of every finished iteration. source is
+    'search', 'book', 'endgame', 'ponder' (the search went on from, or just
+    used, what pondering found; pondered_depth is how deep that was) or
+    'forced' (a single legal move).
+
+    Records are kept in moves and, if sink (a path or an open file) is
+    given, written to it as JSON lines. Parallel searches run in other
+    processes, so for them only nodes and times are counted.
+    '''
+
+    def __init__(self, sink = None):
+        self.moves = []
+        self.owns_sink = isinstance(sink, str)
+        self.sink = open(sink, 'a') if self.owns_sink else sink
+        self.start_move(None)
+
+    def start_move(self, color):
+        self.color = color
+        self.source = 'search'
+        self.t0 = time.perf_counter()
+        self.leaf_evals = 0
+        self.batched = 0
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.cutoffs = []
+        self.iterations = []
+        self.iteration_start = (self.t0, 0, 0)
+        self.pondered_depth = 0
+
+    def probe(self, entry):
+        self.tt_probes += 1
+        if entry is not None:
+            self.tt_hits += 1
+
+    def cutoff(self, index):
+        while len(self.cutoffs) <= index:
+            self.cutoffs.append(0)
+        self.cutoffs[index] += 1
+
+    def start_iteration(self, nodes):
+        self.iteration_start = (time.perf_counter(), nodes, self.batched)
+
+    def end_iteration(self, depth, nodes, value):
+        t0, nodes0, batched0 = self.iteration_start
+        self.iterations.append({'depth': depth, 'nodes': nodes - nodes0 + self.batched - batched0,
+                                'seconds': time.perf_counter() - t0, 'value': value})
+
+    def end_move(self, move, nodes):
+        '''Finishes the record of the move that was played; nodes is the player's node count'''
+        last = self.iterations[-1] if self.iterations else None
+        record = {'color': self.color, 'move': to_action(move), 'source': self.source,
+                  'seconds': time.perf_counter() - self.t0, 'nodes': nodes + self.batched,
+                  'leaf_evals': self.leaf_evals, 'tt_probes': self.tt_probes, 'tt_hits': self.tt_hits,
+                  'cutoffs': self.cutoffs, 'pondered_depth': self.pondered_depth,
+                  'depth': max(last['depth'] if last else 0, self.pondered_depth),
+                  'ebf': effective_branching_factor(last['nodes'], last['depth']) if last else None,
+                  'iterations': self.iterations}
+        self.moves.append(record)
+        if self.sink is not None:
+            self.sink.write(json.dumps(record) + '\n')
+            self.sink.flush()
+        return record
+
+    def close(self):
+        if self.owns_sink:
+            self.sink.close()
+
+    def summary(self):
+        '''Totals and averages over every recorded move'''
+        searched = [m for m in self.moves if m['source'] in ('search', 'ponder') and m['depth']]
+        cutoffs = []
+        for m in self.moves:
+            for i, n in enumerate(m['cutoffs']):
+                if i == len(cutoffs):
+                    cutoffs.append(0)
+                cutoffs[i] += n
+        nodes = sum(m['nodes'] for m in self.moves)
+        seconds = sum(m['seconds'] for m in self.moves)
+        probes = sum(m['tt_probes'] for m in self.moves)
+        ebfs = [m['ebf'] for m in searched if m['ebf'] is not None]
+        return {'moves': len(self.moves), 'searched_moves': len(searched),
+                'nodes': nodes, 'seconds': seconds, 'nodes_per_sec': nodes / seconds if seconds else None,
+                'leaf_evals': sum(m['leaf_evals'] for m in self.moves),
+                'tt_probes': probes,
+                'tt_hit_rate': sum(m['tt_hits'] for m in self.moves) / probes if probes else None,
+                'cutoffs': cutoffs,
+                'first_move_cutoff_rate': cutoffs[0] / sum(cutoffs) if cutoffs else None,
+                'mean_depth': sum(m['depth'] for m in searched) / len(searched) if searched else None,
+                'mean_ebf': sum(ebfs) / len(ebfs) if ebfs else None}
+
+    def print_summary(self, title = 'search'):
+        s = self.summary()
+        def fmt(value, spec):
+            return 'n/a' if value is None else spec % value
+        print("%s: %d moves (%d searched), %d nodes in %.2fs (%s nodes/s), %d leaf evals" % (
+            title, s['moves'], s['searched_moves'], s['nodes'], s['seconds'],
+            fmt(s['nodes_per_sec'], '%.0f'), s['leaf_evals']))
+        print("    mean depth %s, mean EBF %s, TT hit rate %s, cutoffs on first move %s" % (
+            fmt(s['mean_depth'], '%.2f'), fmt(s['mean_ebf'], '%.2f'),
+            fmt(s['tt_hit_rate'] and 100 * s['tt_hit_rate'], '%.1f%%'),
+            fmt(s['first_move_cutoff_rate'] and 100 * s['first_move_cutoff_rate'], '%.1f%%')))
+
+def pruning_report(depth = 4, positions = 8, seed = 5511):
+    '''Nodes MinimaxPlayer, AlphabetaPlayer and AdvancedPlayer visit on the same positions
+
+    Every player searches to depth (endgame solver off) with SearchStats
+    attached. Prints a summary per player and how many fewer nodes each
+    alpha-beta player needed than minimax; returns {class name: summary}.
+    '''
+    samples = sample_positions(positions, seed)
+    makers = {'MinimaxPlayer': lambda c, stats: MinimaxPlayer(c, depth, stats=stats),
+              'AlphabetaPlayer': lambda c, stats: AlphabetaPlayer(c, depth, time_budget=None,
+                                                                  endgame_empties=0, stats=stats),
+              'AdvancedPlayer': lambda c, stats: AdvancedPlayer(c, depth, endgame_empties=0, stats=stats)}
+    summaries = {}
+    for name, make in makers.items():
+        stats = SearchStats()
+        players = {c: make(c, stats) for c in (WHITE, BLACK)}
+        for white, black, blocked, color, num_skips in samples:
+            me = players[color]
+            me.make_move(RandOthelloState(me, OthelloPlayerTemplate(-color), num_skips = num_skips,
+                                          bitboards = (white, black, blocked)))
+        stats.print_summary("%s depth %d" % (name, depth))
+        summaries[name] = stats.summary()
+    base = summaries['MinimaxPlayer']['nodes']
+    for name in ('AlphabetaPlayer', 'AdvancedPlayer'):
+        print("%s visits %.1f%% fewer nodes than MinimaxPlayer" % (
+            name, 100 * (1 - summaries[name]['nodes'] / base)))
+    return summaries
+
+# ---------- Endgame solver ----------
+
+def empty_regions(empty):
+    '''Splits a bitboard of empty squares into its 8-connected regions'''
+    regions = []
+    while empty:
+        region = empty & -empty
+        while True:
+            grown = (region | neighbours(region)) & empty
+            if grown == region:
+                break
+            region = grown
+        regions.append(region)
+        empty ^= region
+    return regions
+
+class EndgameSolver:
+    '''Perfect-play solver for positions with few empty squares
+
+    Scores are final disc differences, the mover's discs minus the
+    opponent's. solve() first settles win/draw/loss with a null window
+    around 0 and then searches the exact difference inside the half-window
+    that result leaves. Moves are tried fastest-first (fewest opponent
+    replies), with moves into odd-sized empty regions first among equals;
+    with PARITY_ONLY or fewer empties left only the parity order is used.
+    Blocked squares simply split the empty regions.
+
+    Raises SearchTimeout at a clock check, every CHECK_EVERY nodes, if
+    deadline (a time.perf_counter() value) would pass before the next one,
+    so it gives up before the deadline rather than after it.
+    '''
+    PARITY_ONLY = 6
+    CHECK_EVERY = 256
+
+    def __init__(self, deadline = INF):
+        self.deadline = deadline
+        self.nodes = 0
+        self.last_check = time.perf_counter()
+
+    def solve(self, own, opp, blocked, passed = False):
+        '''Returns (score, best move) for the owner of own, who is to move
+
+        passed says the opponent skipped on the previous turn, so a skip now
+        ends the game.
+        '''
+        score, move = self.root(own, opp, blocked, -1, 1, passed)
+        if score > 0:
+            return self.root(own, opp, blocked, 0, SIZE * SIZE, passed)
+        if score < 0:
+            return self.root(own, opp, blocked, -SIZE * SIZE, 0, passed)
+        return score, move
+
+    def root(self, own, opp, blocked, alpha, beta, passed):
+        moves = legal_moves(own, opp, blocked)
+        if not moves:
+            if passed:
+                return popcount(own) - popcount(opp), PASS
+            return -self.search(opp, own, blocked, -beta, -alpha, True), PASS
+        best, v = None, -INF
+        for b, f in self.ordered(own, opp, blocked, moves):
+            if f is None:
+                f = flips(b, own, opp)
+            val = -self.search(opp ^ f, own | b | f, blocked, -beta, -alpha, False)
+            if val > v:
+                v, best = val, b.bit_length() - 1
+            if v > alpha:
+                alpha = v
+                if alpha >= beta:
+                    break
+        return v, best
+
+    def search(self, own, opp, blocked, alpha, beta, passed):
+        self.nodes += 1
+        if not self.nodes & (self.CHECK_EVERY - 1):
+            now = time.perf_counter()
+            if now + 2 * (now - self.last_check) > self.deadline:  # twice the last gap, for slower nodes
+                raise SearchTimeout()
+            self.last_check = now
+        empty = FULL & ~(own | opp | blocked)
+        if not empty:
+            return popcount(own) - popcount(opp)
+        if not empty & (empty - 1):
+            return self.last_empty(own, opp, empty)
+        moves = legal_moves(own, opp, blocked)
+        if not moves:
+            if passed:
+                return popcount(own) - popcount(opp)
+            return -self.search(opp, own, blocked, -beta, -alpha, True)
         v = -INF
-        legals = self.order_moves(state, actions(state))
-        for mv in legals:
-            s2 = result(state, mv)
-            if s2 is None: continue
-            v = max(v, self.min_value(s2, depth - 1, alpha, beta))
-            if v >= beta: return v
-            if v > alpha: alpha = v
+        for b, f in self.ordered(own, opp, blocked, moves):
+            if f is None:
+                f = flips(b, own, opp)
+            val = -self.search(opp ^ f, own | b | f, blocked, -beta, -alpha, False)
+            if val > v:
+                v = val
+                if v > alpha:
+                    alpha = v
+                    if alpha >= beta:
+                        break
         return v
-    def min_value(self, state, depth, alpha, beta):
-        if terminal_test(state) or depth == 0:
-            k = board_key(state.board_array, state.current.get_color(), depth)
-            if k in TT: return TT[k]
-            v = EVAL(state, self.color); TT[k] = v; return v
-        v = INF
-        legals = self.order_moves(state, actions(state))
+
+    def last_empty(self, own, opp, b):
+        '''Final score when exactly one square, b, is empty'''
+        diff = popcount(own) - popcount(opp)
+        f = flips(b, own, opp)
+        if f:
+            return diff + 1 + 2 * popcount(f)
+        f = flips(b, opp, own)
+        if f:
+            return diff - 1 - 2 * popcount(f)
+        return diff
+
+    def ordered(self, own, opp, blocked, moves):
+        '''[(move bit, flips)] in search order
+
+        Flips are only worked out here when the mobility probe needs them;
+        otherwise they are None and left to the caller.
+        '''
+        empty = FULL & ~(own | opp | blocked)
+        odd = 0
+        for region in empty_regions(empty):
+            if popcount(region) & 1:
+                odd |= region
+        parity_only = popcount(empty) <= self.PARITY_ONLY
+        keyed = []
+        while moves:
+            b = moves & -moves
+            moves ^= b
+            even = 0 if b & odd else 1
+            if parity_only:
+                keyed.append((even, b, None))
+            else:
+                f = flips(b, own, opp)
+                keyed.append((popcount(legal_moves(opp ^ f, own | b | f, blocked)), even, b, f))
+        keyed.sort(key=lambda k: k[:-1])
+        return [k[-2:] for k in keyed]
+
+# ---------- Batched random games ----------
+
+LANE_BITS = 80  # bits per game in a packed batch: 64 squares plus padding wider than any shift
+
+class GameBatch:
+    '''Many boards packed side by side in one int, LANE_BITS bits per game
+
+    Game i occupies bits LANE_BITS*i up to LANE_BITS*i + 63. The masks are
+    the single-board ones repeated in every lane with the padding left at
+    zero, so a shift that carries a square out of its board lands in padding
+    and is masked away, and one pass of big-int operations works on every
+    game at once.
+    '''
+
+    def __init__(self, n):
+        self.n = n
+        self.lane_bytes = LANE_BITS // 8
+        ones = sum(1 << (LANE_BITS * i) for i in range(n))
+        self.full = FULL * ones
+        self.left_shifts = [(s, mask * ones) for s, mask in LEFT_SHIFTS]
+        self.right_shifts = [(s, mask * ones) for s, mask in RIGHT_SHIFTS]
+
+    def pack(self, boards):
+        '''One batch int from a list of n bitboards'''
+        return int.from_bytes(b''.join(b.to_bytes(self.lane_bytes, 'little') for b in boards), 'little')
+
+    def unpack(self, packed):
+        '''The n bitboards of a batch int'''
+        k = self.lane_bytes
+        raw = packed.to_bytes(self.n * k, 'little')
+        return [int.from_bytes(raw[i:i + k], 'little') for i in range(0, self.n * k, k)]
+
+    def legal_moves(self, own, opp, blocked):
+        '''legal_moves() of every game in the batch'''
+        empty = self.full & ~(own | opp | blocked)
+        moves = 0
+        for n, mask in self.left_shifts:
+            t = opp & mask
+            x = (own << n) & t
+            x |= (x << n) & t
+            x |= (x << n) & t
+            x |= (x << n) & t
+            x |= (x << n) & t
+            x |= (x << n) & t
+            moves |= (x << n) & mask & empty
+        for n, mask in self.right_shifts:
+            t = opp & mask
+            x = (own >> n) & t
+            x |= (x >> n) & t
+            x |= (x >> n) & t
+            x |= (x >> n) & t
+            x |= (x >> n) & t
+            x |= (x >> n) & t
+            moves |= (x >> n) & mask & empty
+        return moves
+
+    def flips(self, bits, own, opp):
+        '''flips() of every game, where bits holds at most one square per game
+
+        Each direction grows the run of opponent discs next to the move, then
+        walks back from the own disc that closes it (if there is one), so
+        only bounded runs survive.
+        '''
+        f = 0
+        for n, mask in self.left_shifts:
+            t = opp & mask
+            x = (bits << n) & t
+            x |= (x << n) & t
+            x |= (x << n) & t
+            x |= (x << n) & t
+            x |= (x << n) & t
+            x |= (x << n) & t
+            y = (x << n) & mask & own
+            if y:
+                y = (y >> n) & x
+                y |= (y >> n) & x
+                y |= (y >> n) & x
+                y |= (y >> n) & x
+                y |= (y >> n) & x
+                y |= (y >> n) & x
+                f |= y
+        for n, mask in self.right_shifts:
+            t = opp & mask
+            x = (bits >> n) & t
+            x |= (x >> n) & t
+            x |= (x >> n) & t
+            x |= (x >> n) & t
+            x |= (x >> n) & t
+            x |= (x >> n) & t
+            y = (x >> n) & mask & own
+            if y:
+                y = (y << n) & x
+                y |= (y << n) & x
+                y |= (y << n) & x
+                y |= (y << n) & x
+                y |= (y << n) & x
+                y |= (y << n) & x
+                f |= y
+        return f
+
+def random_square(moves, rng):
+    '''A uniformly random set bit of a non-empty bitboard'''
+    for i in range(int(rng.random() * popcount(moves))):
+        moves &= moves - 1
+    return moves & -moves
+
+def simulate_random_games(n, seed = None, position = None):
+    '''Plays n independent games of uniformly random moves in lockstep
+
+    Every game starts from position, (white, black, blocked, color,
+    num_skips) as from SearchBoard.position(), or by default from the
+    initial board with its own random blocked squares, Black to move.
+    All games advance one ply per step: legal moves and flips are computed
+    for the whole batch at once (see GameBatch), only the choice of move is
+    made game by game. Returns [(black discs, white discs)] per game.
+    '''
+    rng = random.Random(seed)
+    batch = GameBatch(n)
+    if position is None:
+        layouts = [initial_bitboards(rng.randrange(SIZE), rng.randrange(SIZE)) for i in range(n)]
+        white = batch.pack([w for w, b, x in layouts])
+        black = batch.pack([b for w, b, x in layouts])
+        blocked = batch.pack([x for w, b, x in layouts])
+        color, num_skips = BLACK, 0
+    else:
+        w, b, x, color, num_skips = position
+        white, black, blocked = (batch.pack([bb] * n) for bb in (w, b, x))
+    own, opp = (white, black) if color == WHITE else (black, white)
+    # a game whose mover cannot move passes; once no game has a move for
+    # two plies running, every game is over
+    passes = 2 if num_skips >= 2 else num_skips
+    ply = 0
+    while passes < 2:
+        moves = batch.legal_moves(own, opp, blocked)
+        if moves:
+            passes = 0
+            picks = [random_square(m, rng) if m else 0 for m in batch.unpack(moves)]
+            bits = batch.pack(picks)
+            f = batch.flips(bits, own, opp)
+            own, opp = opp ^ f, own | bits | f
+        else:
+            passes += 1
+            own, opp = opp, own
+        ply += 1
+    if (color == WHITE) == (ply % 2 == 0):
+        white, black = own, opp
+    else:
+        white, black = opp, own
+    return [(popcount(b), popcount(w)) for b, w in zip(batch.unpack(black), batch.unpack(white))]
+
+# ---------- Parallel search ----------
+
+import multiprocessing
+import sys
+from concurrent.futures import ProcessPoolExecutor, wait
+
+class SharedTranspositionTable:
+    '''A TranspositionTable kept in shared memory for several processes
+
+    probe/store/new_search behave like TranspositionTable and probe returns
+    the same entry tuples. Each slot is two unsigned 64-bit words,
+    (key ^ data, data), written without locks: a slot torn by two processes
+    writing at once no longer matches its key and reads as a miss.
+    '''
+
+    def __init__(self, size_bits = 18):
+        self.mask = (1 << size_bits) - 1
+        self.words = multiprocessing.RawArray('Q', 2 << size_bits)
+        self.shared_generation = multiprocessing.RawValue('B', 0)
+
+    @property
+    def generation(self):
+        return self.shared_generation.value
+
+    def new_search(self):
+        self.shared_generation.value = (self.shared_generation.value + 1) & 0xFF
+
+    def clear(self):
+        for i in range(len(self.words)):
+            self.words[i] = 0
+        self.shared_generation.value = 0
+
+    def probe(self, key):
+        i = (key & self.mask) << 1
+        data = self.words[i + 1]
+        if not data or self.words[i] ^ data != key:
+            return None
+        move = (data >> 10) & 0x7F
+        return (key, data & 0xFF, (data >> 8) & 0x3, (data >> 25) - (1 << 31),
+                move - 2 if move else None, (data >> 17) & 0xFF)
+
+    def store(self, key, depth, flag, value, move):
+        i = (key & self.mask) << 1
+        generation = self.shared_generation.value
+        old = self.words[i + 1]
+        if old and (old >> 17) & 0xFF == generation and depth < old & 0xFF:
+            return
+        data = (depth | flag << 8 | (0 if move is None else move + 2) << 10
+                | generation << 17 | (value + (1 << 31)) << 25)
+        self.words[i] = key ^ data
+        self.words[i + 1] = data
+
+# State of a pool worker process, filled in by _init_search_worker
+_search_worker = {}
+
+def _init_search_worker(player_class, color, depth_limit, weights, alpha, tt, stop=None):
+    player = player_class(color, depth_limit=depth_limit, weights=weights)
+    if tt is not None:
+        player.tt = tt
+    player.stop = stop
+    _search_worker['player'] = player
+    _search_worker['alpha'] = alpha
+    _search_worker['root'] = None
+
+def _worker_player(position, deadline):
+    '''The worker's player, set up for a search of position that ends at deadline'''
+    player = _search_worker['player']
+    if _search_worker['root'] != position and not isinstance(player.tt, SharedTranspositionTable):
+        player.tt.new_search()
+    _search_worker['root'] = position
+    player.nodes = 0
+    # deadline is wall-clock time so it means the same thing in every process
+    player.deadline = INF if deadline is None else time.perf_counter() + deadline - time.time()
+    return player
+
+def _split_task(position, move, depth, deadline):
+    '''Searches one root move against the shared alpha
+
+    Returns (move, value, exact, nodes); value is None if time ran out and
+    exact is False when value is only an upper bound.
+    '''
+    player = _worker_player(position, deadline)
+    alpha = _search_worker['alpha']
+    board = SearchBoard(*position)
+    board.apply(move)
+    a = alpha.value
+    player.root_depth = depth
+    try:
+        if time.perf_counter() > player.deadline:
+            raise SearchTimeout()
+        val = player.min_value(board, depth - 1, a, INF)
+    except SearchTimeout:
+        return move, None, False, player.nodes
+    with alpha.get_lock():
+        if val > alpha.value:
+            alpha.value = val
+    return move, val, val > a, player.nodes
+
+def _lazy_task(position, legals, index, deadline):
+    '''One Lazy-SMP helper: iterative deepening with its own start depth and root order'''
+    player = _worker_player(position, deadline)
+    board = SearchBoard(*position)
+    if index:
+        rest = legals[1:]
+        random.Random(index).shuffle(rest)
+        legals = legals[:1] + rest
+    done, val, move = player.iterative_deepening(board, legals, first_depth=1 + index % 2)
+    return done, val, move, player.nodes
+
+class ParallelSearch:
+    '''Process pool that searches the root for an alpha-beta player
+
+    'split' mode hands out one root move per task. Workers read the best
+    score found so far at that depth from a shared alpha before they start
+    and raise it when they beat it, so later moves are searched with a
+    narrower window. 'lazy' mode (Lazy SMP) has every worker run the
+    player's own iterative deepening on the whole position, staggered by
+    start depth and root move order, all sharing one
+    SharedTranspositionTable; the deepest finished search wins.
+
+    Workers build their own copy of the player from its class, color,
+    depth_limit and weights.
+    '''
+
+    def __init__(self, player, workers, mode = 'split'):
+        if mode not in ('split', 'lazy'):
+            raise ValueError("parallel mode must be 'split' or 'lazy', not %r" % (mode,))
+        self.mode = mode
+        self.workers = workers
+        self.alpha = multiprocessing.Value('q', -INF)
+        self.tt = SharedTranspositionTable() if mode == 'lazy' else None
+        self.nodes = 0
+        self.executor = ProcessPoolExecutor(
+            workers, initializer=_init_search_worker,
+            initargs=(type(player), player.color, player.depth_limit, player.weights, self.alpha, self.tt))
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    @staticmethod
+    def wall_deadline(deadline):
+        return None if deadline == INF else time.time() + deadline - time.perf_counter()
+
+    def split_search(self, board, legals, depth, deadline):
+        '''Root-split search of one depth; returns (value, move) or None on timeout'''
+        self.alpha.value = -INF
+        position = board.position()
+        wall = self.wall_deadline(deadline)
+        futures = [self.executor.submit(_split_task, position, mv, depth, wall) for mv in legals]
+        wait(futures)
+        best = None
+        for f in futures:
+            move, val, exact, nodes = f.result()
+            self.nodes += nodes
+            if val is None:
+                return None
+            if best is None or (val, exact) > (best[0], best[2]):
+                best = (val, move, exact)
+        return best[0], best[1]
+
+    def lazy_search(self, board, legals, deadline):
+        '''Lazy-SMP search; returns the move of the deepest finished search'''
+        self.tt.new_search()
+        position = board.position()
+        wall = self.wall_deadline(deadline)
+        futures = [self.executor.submit(_lazy_task, position, legals, i, wall) for i in range(self.workers)]
+        wait(futures)
+        best_depth, best_move = 0, legals[0]
+        for f in futures:
+            done, val, move, nodes = f.result()
+            self.nodes += nodes
+            if done > best_depth:
+                best_depth, best_move = done, move
+        return best_move
+
+def _ponder_task(position, predicted, deadline):
+    '''Searches our answer to each opponent reply from position, predicted reply first
+
+    Runs the player's iterative deepening on every reply in turn until the
+    shared stop flag is set. Returns {hash: (depth, move)} for the positions
+    it finished at least one depth of.
+    '''
+    player = _worker_player(position, deadline)
+    board = SearchBoard(*position)
+    replies = board.moves()
+    if predicted in replies:
+        replies = [predicted] + [m for m in replies if m != predicted]
+    found = {}
+    for reply in replies:
+        undo = board.apply(reply)
+        if not terminal_test(board):
+            done, val, move = player.iterative_deepening(SearchBoard(*board.position()), board.moves())
+            found[board.hash] = (done, move)
+        board.undo(undo)
+        if player.stop.value or time.perf_counter() > player.deadline:
+            break
+    return found
+
+class Ponderer:
+    '''Searches on the opponent's time for an alpha-beta player
+
+    After the player moves, start() hands the new position to a helper
+    process, which searches the player's answer to every possible reply,
+    the reply the player's own search expected first. The helper shares the
+    player's SharedTranspositionTable. stop(), called when the player is
+    asked for its next move, raises a shared flag that ends the helper's
+    search within CHECK_EVERY nodes, and returns what it finished.
+
+    Pondering only adds thinking time when the helper has a CPU of its own;
+    otherwise it competes with the opponent for the same one.
+
+    The helper process is started with the Ponderer, not on the first
+    move. overhead is the longest start() so far (at least one thread
+    switch interval); the player takes twice that off its search deadline,
+    since start() runs after the search and takes longer whenever the
+    helper grabs the CPU straight away.
+    '''
+
+    def __init__(self, player):
+        self.tt = SharedTranspositionTable()
+        self.flag = multiprocessing.Value('b', 0)
+        self.player = player
+        self.executor = None
+        self.future = None
+        # submit() wakes the executor's feeder thread, which can hold the GIL for a switch interval
+        self.overhead = sys.getswitchinterval()
+        self.open()
+
+    def open(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                1, initializer=_init_search_worker,
+                initargs=(type(self.player), self.player.color, self.player.depth_limit, self.player.weights,
+                          None, self.tt, self.flag))
+            self.executor.submit(int).result()  # spawns the helper now
+
+    def start(self, position, move):
+        t0 = time.perf_counter()
+        board = SearchBoard(*position)
+        board.apply(move)
+        if terminal_test(board):
+            return
+        self.open()
+        entry = self.tt.probe(board.key)
+        predicted = board.real_move(entry[4]) if entry is not None else None
+        self.flag.value = 0
+        self.future = self.executor.submit(_ponder_task, board.position(), predicted, None)
+        self.overhead = max(self.overhead, time.perf_counter() - t0)
+
+    def stop(self):
+        if self.future is None:
+            return {}
+        self.flag.value = 1
+        found = self.future.result()
+        self.future = None
+        return found
+
+    def close(self):
+        self.stop()
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+def sample_positions(n, seed = 5511, min_ply = 8, max_ply = 40):
+    '''n positions from seeded random games, as (white, black, blocked, color, num_skips)'''
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < n:
+        board = SearchBoard(*initial_bitboards(rng.randrange(8), rng.randrange(8)), BLACK)
+        stop = rng.randrange(min_ply, max_ply)
+        for ply in range(stop):
+            if terminal_test(board):
+                break
+            board.apply(rng.choice(board.moves()))
+        if not terminal_test(board) and board.moves() != [PASS]:
+            positions.append(board.position())
+    return positions
+
+def parallel_speedup_report(player_class = AlphabetaPlayer, depth = 5, worker_counts = (1, 2, 4, 8),
+                            mode = 'split', positions = 8, seed = 5511):
+    '''Times fixed-depth searches of the same positions with 1, 2, 4 and 8 workers
+
+    Prints one line per worker count and returns them as a list of dicts.
+    '''
+    samples = sample_positions(positions, seed)
+    rows = []
+    base = None
+    for n in worker_counts:
+        kwargs = {'depth_limit': depth, 'workers': n, 'parallel': mode}
+        if player_class is not AdvancedPlayer:
+            kwargs['time_budget'] = None
+        players = {c: player_class(c, **kwargs) for c in (WHITE, BLACK)}
+        if n > 1:
+            # start the pools before timing anything
+            for p in players.values():
+                p.parallel_search()
+        t0 = time.perf_counter()
+        for white, black, blocked, color, num_skips in samples:
+            me = players[color]
+            state = RandOthelloState(me, OthelloPlayerTemplate(-color), num_skips = num_skips,
+                                     bitboards = (white, black, blocked))
+            me.make_move(state)
+        elapsed = time.perf_counter() - t0
+        for p in players.values():
+            p.close()
+        base = base or elapsed
+        rows.append({'workers': n, 'seconds': elapsed, 'speedup': base / elapsed})
+        print("%s %s workers=%d: %.2fs, speedup %.2fx" % (player_class.__name__, mode, n, elapsed, base / elapsed))
+    return rows
+
+# ---------- Monte Carlo tree search ----------
+
+import math
+from array import array
+
+def random_playout(own, opp, blocked, passed, rng):
+    '''Plays uniformly random moves to the end of the game
+
+    own is to move; passed says the previous turn was a skip. Returns the
+    final disc difference, own's discs minus opp's.
+    '''
+    sign = 1
+    while True:
+        moves = legal_moves(own, opp, blocked)
+        if moves:
+            b = random_square(moves, rng)
+            f = flips(b, own, opp)
+            own, opp = opp ^ f, own | b | f
+            passed = False
+        elif passed:
+            break
+        else:
+            own, opp = opp, own
+            passed = True
+        sign = -sign
+    return sign * (popcount(own) - popcount(opp))
+
+class MCTSPlayer(OthelloPlayerTemplate):
+    '''UCT Monte Carlo tree search under a wall-clock budget
+
+    Children are picked by mean result plus the UCT exploration term plus a
+    progressive bias, bias * SQUARE_PRIOR / 20 / (visits + 1), that steers
+    the first visits towards good squares and fades as real results come
+    in. Leaves are scored by one random_playout each (1 win, 0.5 draw).
+
+    The tree lives in parallel arrays indexed by node number; the children
+    of a node are a contiguous block (first, count), so there is no object
+    per node. Between moves the subtree under the position actually reached
+    is kept and compacted to the front, so memory stays proportional to one
+    move's worth of playouts.
+
+    With workers > 1, root parallelism: worker processes grow their own
+    trees from the same root for the same budget and their root visit
+    counts are added to this player's before the most visited move is
+    played. Call close() to shut the pool down.
+    '''
+
+    def __init__(self, mycolor, time_budget=1.0, exploration=0.7, bias=1.0, workers=1, seed=None):
+        self.color = mycolor
+        self.time_budget = time_budget
+        self.exploration = exploration
+        self.bias = bias
+        self.workers = workers
+        self.pool = None
+        self.rng = random.Random(seed)
+        self.nodes = 0
+        self.clear()
+    def get_color(self):
+        return self.color
+    def clear(self):
+        '''Drops the whole tree'''
+        self.parent = array('i')
+        self.move = array('b')
+        self.first = array('i')   # index of the first child, -1 until expanded
+        self.count = array('b')   # number of children
+        self.visits = array('i')
+        self.wins = array('d')    # results for the player who moved into the node
+        self.prior = array('d')
+        self.root_position = None
+        self.add_node(-1, PASS, 0.0)
+    def add_node(self, parent, move, prior):
+        self.parent.append(parent)
+        self.move.append(move)
+        self.first.append(-1)
+        self.count.append(0)
+        self.visits.append(0)
+        self.wins.append(0.0)
+        self.prior.append(prior)
+    def make_move(self, state):
+        deadline = time.perf_counter() + self.time_budget
+        board = SearchBoard.from_state(state)
+        legals = board.moves()
+        if len(legals) == 1:
+            return to_action(legals[0])
+        self.reuse_tree(board)
+        futures = []
+        if self.workers > 1:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.workers - 1)
+            wall = time.time() + self.time_budget
+            futures = [self.pool.submit(_mcts_task, board.position(), wall, self.rng.getrandbits(32),
+                                        self.exploration, self.bias)
+                       for i in range(self.workers - 1)]
+        self.nodes = self.search(board, deadline)
+        totals = {}
+        for c in range(self.first[0], self.first[0] + self.count[0]):
+            totals[self.move[c]] = self.visits[c]
+        for f in futures:
+            playouts, root_visits = f.result()
+            self.nodes += playouts
+            for mv, visits in root_visits:
+                totals[mv] = totals.get(mv, 0) + visits
+        return to_action(max(totals, key=totals.get))
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+    def search(self, board, deadline):
+        '''Runs playouts from board (the root) until deadline; returns how many'''
+        root_color = board.color
+        playouts = 0
+        while True:
+            self.iterate(board, root_color)
+            playouts += 1
+            if time.perf_counter() > deadline:
+                return playouts
+    def iterate(self, board, root_color):
+        '''One selection, expansion, playout and backup; leaves board as it found it'''
+        node = 0
+        path = [0]
+        undos = []
+        while not terminal_test(board):
+            if self.first[node] < 0:
+                self.expand(node, board)
+                node = self.select(node)
+                undos.append(board.apply(self.move[node]))
+                path.append(node)
+                break
+            node = self.select(node)
+            undos.append(board.apply(self.move[node]))
+            path.append(node)
+        own, opp = own_and_opp(board, WHITE)
+        if terminal_test(board):
+            diff = popcount(own) - popcount(opp)
+        else:
+            if board.color == BLACK:
+                own, opp = opp, own
+            diff = board.color * random_playout(own, opp, board.blocked, board.num_skips == 1, self.rng)
+        white_result = 1.0 if diff > 0 else 0.0 if diff < 0 else 0.5
+        for undo in reversed(undos):
+            board.undo(undo)
+        # the player who moved into path[k] is the one to move k - 1 plies below the root
+        mover_white = root_color == WHITE
+        self.visits[0] += 1
+        for node in path[1:]:
+            self.visits[node] += 1
+            self.wins[node] += white_result if mover_white else 1.0 - white_result
+            mover_white = not mover_white
+    def expand(self, node, board):
+        self.first[node] = len(self.parent)
+        legals = board.moves()
+        self.count[node] = len(legals)
         for mv in legals:
-            s2 = result(state, mv)
-            if s2 is None: continue
-            v = min(v, self.max_value(s2, depth - 1, alpha, beta))
-            if v <= alpha: return v
-            if v < beta: beta = v
-        return v
+            self.add_node(node, mv, 0.0 if mv == PASS else SQUARE_PRIOR[mv] / 20)
+    def select(self, node):
+        first = self.first[node]
+        visits, wins, prior = self.visits, self.wins, self.prior
+        log_n = math.log(visits[node] + 1)
+        best, best_score = first, -INF
+        for c in range(first, first + self.count[node]):
+            n = visits[c]
+            if n == 0:
+                # unvisited children first, best prior first
+                score = INF + prior[c]
+            else:
+                score = wins[c] / n + self.exploration * math.sqrt(log_n / n) + self.bias * prior[c] / (n + 1)
+            if score > best_score:
+                best, best_score = c, score
+        return best
+    def reuse_tree(self, board):
+        '''Re-roots the tree at board if it is the old root or two plies below it, else clears it'''
+        target = board.hash
+        old = self.root_position
+        self.root_position = board.position()
+        if old is None:
+            return
+        prev = SearchBoard(*old)
+        if prev.hash == target:
+            return
+        first, count = self.first, self.count
+        for c in range(first[0], first[0] + count[0]):
+            undo = prev.apply(self.move[c])
+            for g in range(first[c], first[c] + count[c]):
+                undo2 = prev.apply(self.move[g])
+                found = prev.hash == target
+                prev.undo(undo2)
+                if found:
+                    self.reroot(g)
+                    return
+            prev.undo(undo)
+        self.clear()
+        self.root_position = board.position()
+    def reroot(self, node):
+        '''Keeps only the subtree under node, renumbered breadth first so node becomes 0'''
+        fields = (self.parent, self.move, self.first, self.count, self.visits, self.wins, self.prior)
+        old = fields
+        new = tuple(array(f.typecode) for f in fields)
+        for f, o in zip(new, old):
+            f.append(o[node])
+        new[0][0] = -1
+        queue = [node]
+        for i, o in enumerate(queue):
+            if old[2][o] < 0:
+                continue
+            new[2][i] = len(new[0])
+            for c in range(old[2][o], old[2][o] + old[3][o]):
+                for f, of in zip(new, old):
+                    f.append(of[c])
+                new[0][-1] = i
+                new[2][-1] = -1
+                queue.append(c)
+        self.parent, self.move, self.first, self.count, self.visits, self.wins, self.prior = new
+
+def _mcts_task(position, deadline, seed, exploration, bias):
+    '''Root-parallel helper: grows a fresh tree until deadline (wall-clock)
+
+    Returns the number of playouts and [(move, visits)] for the root's children.
+    '''
+    board = SearchBoard(*position)
+    player = MCTSPlayer(board.color, exploration=exploration, bias=bias, seed=seed)
+    playouts = player.search(board, time.perf_counter() + deadline - time.time())
+    return playouts, [(player.move[c], player.visits[c])
+                      for c in range(player.first[0], player.first[0] + player.count[0])]
+
+# ---------- Opening book ----------
+
+import mmap
+import os
+import struct
+
+BOOK_MAGIC = b'ROBK'
+BOOK_VERSION = 2
+BOOK_HEADER = struct.Struct('<4sII')    # magic, version, number of slots (a power of two)
+BOOK_RECORD = struct.Struct('<QbBxxi')  # key (0 = empty slot), move, search depth, value
+
+class OpeningBook:
+    '''Read-only opening book backed by a memory-mapped file
+
+    The file is an open-addressed (linear probing) hash table of fixed-size
+    records keyed by SearchBoard.key, written by write_book, with moves in
+    the orientation of the key. Zobrist keys come from a fixed seed, so a
+    book stays valid from run to run.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.slots = BOOK_HEADER.unpack_from(self.map, 0)
+        if magic != BOOK_MAGIC or version != BOOK_VERSION:
+            raise ValueError("%s is not a version %d opening book" % (path, BOOK_VERSION))
+        self.mask = self.slots - 1
+
+    def __len__(self):
+        return sum(1 for i in range(self.slots) if self.record(i)[0])
+
+    def record(self, i):
+        return BOOK_RECORD.unpack_from(self.map, BOOK_HEADER.size + i * BOOK_RECORD.size)
+
+    def lookup(self, key):
+        '''The book move (a SearchBoard move) for the position with this hash, or None'''
+        i = key & self.mask
+        while True:
+            k, move, depth, value = self.record(i)
+            if k == key:
+                return move
+            if not k:
+                return None
+            i = (i + 1) & self.mask
+
+    def close(self):
+        self.map.close()
+
+def write_book(path, entries):
+    '''Writes (key, move, depth, value) entries as a book file, at most half full'''
+    slots = 2
+    while slots < 2 * len(entries):
+        slots <<= 1
+    mask = slots - 1
+    table = bytearray(BOOK_HEADER.size + slots * BOOK_RECORD.size)
+    BOOK_HEADER.pack_into(table, 0, BOOK_MAGIC, BOOK_VERSION, slots)
+    for key, move, depth, value in entries:
+        i = key & mask
+        while BOOK_RECORD.unpack_from(table, BOOK_HEADER.size + i * BOOK_RECORD.size)[0]:
+            i = (i + 1) & mask
+        BOOK_RECORD.pack_into(table, BOOK_HEADER.size + i * BOOK_RECORD.size, key, move, depth, value)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(table)
+    os.replace(tmp, path)
+
+def book_positions(x1, x2, plies):
+    '''Distinct non-terminal positions in the first plies plies of the layout (x1, x2)
+
+    Returns {key: position}, positions as from SearchBoard.position(), so
+    positions that are symmetric images of each other appear once. Only
+    positions with a real choice (two or more legal moves) are kept.
+    '''
+    positions = {}
+    seen = set()
+    frontier = [SearchBoard(*initial_bitboards(x1, x2), BLACK).position()]
+    for ply in range(plies):
+        next_frontier = []
+        for position in frontier:
+            board = SearchBoard(*position)
+            if board.key in seen or terminal_test(board):
+                continue
+            seen.add(board.key)
+            legals = board.moves()
+            if len(legals) > 1:
+                positions[board.key] = position
+            for mv in legals:
+                undo = board.apply(mv)
+                next_frontier.append(board.position())
+                board.undo(undo)
+        frontier = next_frontier
+    return positions
+
+def _book_layout(job):
+    '''Searches every book position of one blocked layout; returns book entries'''
+    x1, x2, plies, depth = job
+    searchers = {c: AlphabetaPlayer(c, depth_limit=depth, time_budget=None, endgame_empties=0)
+                 for c in (WHITE, BLACK)}
+    entries = []
+    for key, position in book_positions(x1, x2, plies).items():
+        board = SearchBoard(*position)
+        searcher = searchers[board.color]
+        searcher.start_search()
+        done, value, move = searcher.iterative_deepening(board, board.moves())
+        entries.append((key, board.key_move(move), done, value))
+    return entries
+
+def build_book(path, plies = 6, depth = 5, processes = None):
+    '''Builds an opening book for all 64 blocked layouts and writes it to path
 
+    Every position in the first plies plies of every layout is searched to
+    depth by AlphabetaPlayer; layouts are spread across a process pool.
+    Returns the number of positions written.
+    '''
+    jobs = [(x1, x2, plies, depth) for x1 in range(SIZE) for x2 in range(SIZE)]
+    entries = {}
+    with ProcessPoolExecutor(processes) as executor:
+        for layout_entries in executor.map(_book_layout, jobs):
+            for entry in layout_entries:
+                entries[entry[0]] = entry
+    write_book(path, list(entries.values()))
+    return len(entries)
 
 # ---------- Runner ----------
 
-def play_game(p1 = None, p2 = None, show=False):
+COLOR_NAMES = {BLACK: "Black", WHITE: "White"}
+
+def checked_result(state, action):
+    '''result() of a move chosen by a player, or None if the move is not legal'''
+    if action == SKIP:
+        own, opp = own_and_opp(state, state.current.get_color())
+        if legal_moves(own, opp, state.blocked):
+            return None
+        return result(state, action)
+    if not isinstance(action, tuple) or len(action) != 2:
+        return None
+    return result(state, action)
+
+def winner(state):
+    '''Color with more discs, or EMPTY for a tie'''
+    wcount, bcount = state.white_count, state.black_count
+    if wcount > bcount:
+        return WHITE
+    if bcount > wcount:
+        return BLACK
+    return EMPTY
+
+def play_game(p1 = None, p2 = None, show=False, verbose=True, state=None, on_move=None):
+    '''Plays p1 (Black) against p2 (White); returns the winner's color, or EMPTY for a tie
+
+    state starts from a given position (whose current and other players
+    should be p1 and p2) instead of a fresh random board. on_move, if given,
+    is called as on_move(state, action, seconds, next_state) after every
+    legal move, with the time make_move took. verbose=False silences the
+    game-over and illegal-move messages.
+    '''
     if p1 == None:
         p1 = HumanPlayer(BLACK)
     if p2 == None:
         p2 = HumanPlayer(WHITE)
 
-    s = RandOthelloState(p1, p2)
+    s = state if state != None else RandOthelloState(p1, p2)
     while True:
-        action = p1.make_move(s)
-        if action not in actions(s):
-            print("Illegal move made by Black")
-            print("White wins!")
-            return
-        s = result(s, action)
-        if show:
-            display(s)
-        if terminal_test(s):
-            print("Game Over")
-            display(s)
-            display_final(s)
-            return
-        action = p2.make_move(s)
-        if action not in actions(s):
-            print("Illegal move made by White")
-            print("Black wins!")
-            return
-        s = result(s, action)
+        mover = s.current
+        t0 = time.perf_counter()
+        action = mover.make_move(s)
+        elapsed = time.perf_counter() - t0
+        s2 = checked_result(s, action)
+        if s2 == None:
+            if verbose:
+                print("Illegal move made by " + COLOR_NAMES[mover.get_color()])
+                print(COLOR_NAMES[-mover.get_color()] + " wins!")
+            return -mover.get_color()
+        if on_move != None:
+            on_move(s, action, elapsed, s2)
+        s = s2
         if show:
             display(s)
         if terminal_test(s):
-            print("Game Over")
-            display(s)
-            display_final(s)
-            return
+            if verbose:
+                print("Game Over")
+                display(s)
+                display_final(s)
+            return winner(s)
 
 def auto_match():
     print("Match 1: AlphaBeta(BLACK) vs Random(WHITE)")
@@ -523,12 +2439,648 @@ def auto_match():
     p_white = AlphabetaPlayer(WHITE, depth_limit=4)
     play_game(p_black, p_white, show=False)
 
+# ---------- Tournament ----------
+
+import ast
+import csv
+import inspect
+
+def parse_player_spec(spec):
+    '''Parses "AlphabetaPlayer:depth_limit=4,time_budget=0.5" into (class name, kwargs)'''
+    name, _, args = spec.partition(':')
+    kwargs = {}
+    for arg in filter(None, args.split(',')):
+        key, _, value = arg.partition('=')
+        kwargs[key.strip()] = ast.literal_eval(value.strip())
+    if not isinstance(globals().get(name), type) or not issubclass(globals()[name], OthelloPlayerTemplate):
+        raise ValueError("unknown player class %r" % (name,))
+    return name, kwargs
+
+def make_player(spec, color, **extra):
+    '''A player from a spec string; extra keyword arguments are passed on as well'''
+    name, kwargs = parse_player_spec(spec)
+    kwargs.update(extra)
+    return globals()[name](color, **kwargs)
+
+def takes_stats(spec):
+    '''Whether the spec's player class takes a SearchStats as stats'''
+    return 'stats' in inspect.signature(globals()[parse_player_spec(spec)[0]]).parameters
+
+def _tournament_game(game):
+    '''Plays one seeded game in a worker process and returns its record'''
+    seed, black_spec, white_spec = game
+    random.seed(seed)
+    players = {BLACK: make_player(black_spec, BLACK), WHITE: make_player(white_spec, WHITE)}
+    moves = {BLACK: [], WHITE: []}
+    final = []
+    recorder = GameRecorder(seed=seed, black=black_spec, white=white_spec)
+    def on_move(state, action, seconds, next_state):
+        mover = state.current
+        moves[mover.get_color()].append((seconds, getattr(mover, 'nodes', None)))
+        final[:] = [next_state]
+        recorder(state, action, seconds, next_state)
+    won = play_game(players[BLACK], players[WHITE], verbose=False, on_move=on_move)
+    for p in players.values():
+        if hasattr(p, 'close'):
+            p.close()
+    record = {'seed': seed, 'black': black_spec, 'white': white_spec, 'winner': won,
+              'black_discs': popcount(final[0].black) if final else None,
+              'white_discs': popcount(final[0].white) if final else None}
+    for color, key in ((BLACK, 'black'), (WHITE, 'white')):
+        record[key + '_moves'] = moves[color]
+    record['game'] = recorder.games[0] if recorder.games else None
+    return record
+
+ELO_SCORE_LIMIT = 1e-6  # scores are clamped to [this, 1 - this] first, which caps Elo at +-2400
+
+def elo_clamped(score):
+    '''Whether score is so close to 0 or 1 that its Elo is only the cap'''
+    return not ELO_SCORE_LIMIT < score < 1 - ELO_SCORE_LIMIT
+
+def elo_from_score(score, n):
+    '''Elo difference with a 95% interval for a mean score (1 win, 0.5 draw) over n games
+
+    The interval is Wilson's score interval, which unlike the normal
+    approximation keeps its width when every game was won (or lost).
+    '''
+    def elo(s):
+        s = min(max(s, ELO_SCORE_LIMIT), 1 - ELO_SCORE_LIMIT)
+        return 400 * math.log10(s / (1 - s))
+    if not n:
+        return elo(score), elo(score), elo(score)
+    z2 = 1.96 ** 2
+    center = (score + z2 / (2 * n)) / (1 + z2 / n)
+    margin = math.sqrt(z2 * score * (1 - score) / n + z2 * z2 / (4 * n * n)) / (1 + z2 / n)
+    return elo(score), elo(center - margin), elo(center + margin)
+
+def percentile(sorted_values, p):
+    '''Nearest-rank percentile of an already sorted list'''
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, math.ceil(p / 100 * len(sorted_values)) - 1))]
+
+def player_summary(moves):
+    '''Latency percentiles and search speed over a list of (seconds, nodes) moves'''
+    latencies = sorted(t for t, nodes in moves)
+    timed = [(t, nodes) for t, nodes in moves if nodes is not None]
+    total_time = sum(t for t, nodes in timed)
+    return {'moves': len(moves),
+            'latency_p50': percentile(latencies, 50), 'latency_p90': percentile(latencies, 90),
+            'latency_p99': percentile(latencies, 99), 'latency_max': latencies[-1] if latencies else None,
+            'nodes_per_sec': sum(nodes for t, nodes in timed) / total_time if total_time else None}
+
+def summarize_pairing(a, b, records):
+    '''Results of a against b over records, from a's point of view
+
+    Each record's player_color says which color a played, so a pairing of
+    a spec with itself is still told apart by position.
+    '''
+    wins = draws = losses = 0
+    moves = {'player': [], 'opponent': []}
+    for r in records:
+        a_color = r['player_color']
+        if r['winner'] == a_color:
+            wins += 1
+        elif r['winner'] == EMPTY:
+            draws += 1
+        else:
+            losses += 1
+        mine, theirs = ('black', 'white') if a_color == BLACK else ('white', 'black')
+        moves['player'].extend(r[mine + '_moves'])
+        moves['opponent'].extend(r[theirs + '_moves'])
+    n = len(records)
+    score = (wins + draws / 2) / n if n else 0.0
+    elo, elo_low, elo_high = elo_from_score(score, n)
+    return {'player': a, 'opponent': b, 'games': n, 'wins': wins, 'draws': draws, 'losses': losses,
+            'win_rate': wins / n if n else 0.0, 'score': score,
+            'elo': elo, 'elo_ci95': [elo_low, elo_high], 'elo_clamped': elo_clamped(score),
+            'player_stats': player_summary(moves['player']), 'opponent_stats': player_summary(moves['opponent'])}
+
+def run_tournament(pairings, games = 100, processes = None, seed = 0, json_path = None, csv_path = None,
+                   record_path = None):
+    '''Plays games between each (spec_a, spec_b) pairing across a process pool
+
+    Specs are strings for parse_player_spec. Games come in pairs that share
+    a seed (and so the blocked squares and any random choices) with the
+    colors swapped, so an odd number of games is rounded up. Each game's
+    record gets the index of its pairing and the color spec_a played.
+    Returns the summary, one entry per pairing, and optionally writes the summary and every game to
+    json_path, one row per game to csv_path and the game records (see
+    GameRecorder) to record_path.
+    '''
+    jobs = []
+    sides = []  # (pairing index, color of spec_a) for each job
+    for i, (a, b) in enumerate(pairings):
+        for g in range((games + 1) // 2):
+            game_seed = seed + g
+            jobs.append((game_seed, a, b))
+            jobs.append((game_seed, b, a))
+            sides += [(i, BLACK), (i, WHITE)]
+    with ProcessPoolExecutor(processes) as executor:
+        records = list(executor.map(_tournament_game, jobs, chunksize=4))
+    for r, (i, a_color) in zip(records, sides):
+        r['pairing'], r['player_color'] = i, a_color
+    summary = []
+    for i, (a, b) in enumerate(pairings):
+        mine = [r for r in records if r['pairing'] == i]
+        summary.append(summarize_pairing(a, b, mine))
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'summary': summary, 'games': records}, f, indent=1)
+    if record_path:
+        with open(record_path, 'a') as f:
+            for r in records:
+                if r['game'] is not None:
+                    f.write(json.dumps(r['game']) + '\n')
+    if csv_path:
+        with open(csv_path, 'w', newline='') as f:
+            out = csv.writer(f)
+            out.writerow(['seed', 'black', 'white', 'winner', 'black_discs', 'white_discs',
+                          'black_moves', 'white_moves', 'black_seconds', 'white_seconds'])
+            for r in records:
+                out.writerow([r['seed'], r['black'], r['white'], r['winner'], r['black_discs'], r['white_discs'],
+                              len(r['black_moves']), len(r['white_moves']),
+                              sum(t for t, n in r['black_moves']), sum(t for t, n in r['white_moves'])])
+    return summary
+
+def print_tournament(summary):
+    for s in summary:
+        clamped = ""
+        if s['elo_clamped']:
+            clamped = " (clamped: no games %s)" % ('lost' if s['score'] > 0.5 else 'won')
+        print("%s vs %s: %d games, +%d =%d -%d, win rate %.1f%%, Elo %+.0f%s [%+.0f, %+.0f]" % (
+            s['player'], s['opponent'], s['games'], s['wins'], s['draws'], s['losses'],
+            100 * s['win_rate'], s['elo'], clamped, s['elo_ci95'][0], s['elo_ci95'][1]))
+        for who in ('player_stats', 'opponent_stats'):
+            st = s[who]
+            nps = "%.0f nodes/s" % st['nodes_per_sec'] if st['nodes_per_sec'] else "nodes/s n/a"
+            if st['moves']:
+                print("    %s: %s, latency p50 %.3fs p90 %.3fs p99 %.3fs max %.3fs" % (
+                    s['player'] if who == 'player_stats' else s['opponent'], nps,
+                    st['latency_p50'], st['latency_p90'], st['latency_p99'], st['latency_max']))
+
+# ---------- Game records ----------
+
+GAME_FORMAT = 'randothello-game'
+CORPUS_FORMAT = 'randothello-positions'
+RECORD_VERSION = 1
+
+def from_action(action):
+    '''Converts an action for result() to a SearchBoard move'''
+    return PASS if action == SKIP else action[0] * SIZE + action[1]
+
+def blocked_layout(blocked):
+    '''(x1, x2) such that initial_bitboards(x1, x2) has these blocked squares, or None'''
+    for x1 in range(SIZE):
+        for x2 in range(SIZE):
+            if BIT[x1][0] | BIT[x2][SIZE - 1] == blocked:
+                return x1, x2
+    return None
+
+class GameRecorder:
+    '''Keeps a record of every game played through it
+
+    Pass a recorder as play_game's on_move. A record is a dict with the
+    blocked layout [x1, x2] (see initial_bitboards), the players' names,
+    the moves as SearchBoard moves (square indices, PASS for SKIP), the
+    seconds each took, the mover's node count after each (None for players
+    that do not count), the winner and the final disc counts. A game that
+    did not start from its layout's first position also keeps that
+    position as start. info, such as a seed, is copied into every record.
+
+    Records are kept in games and, if sink (a path or an open file) is
+    given, written to it as JSON lines, one per game. A game lost to an
+    illegal move has no final position and is not recorded.
+    '''
+
+    def __init__(self, sink = None, **info):
+        self.games = []
+        self.info = info
+        self.owns_sink = isinstance(sink, str)
+        self.sink = open(sink, 'a') if self.owns_sink else sink
+        self.game = None
+        self.last = None
+
+    def __call__(self, state, action, seconds, next_state):
+        if state is not self.last:
+            self.start(state)
+        self.last = next_state
+        mover = state.current
+        self.game['moves'].append(from_action(action))
+        self.game['seconds'].append(round(seconds, 6))
+        self.game['nodes'].append(getattr(mover, 'nodes', None))
+        if terminal_test(next_state):
+            self.finish(next_state)
+
+    def start(self, state):
+        board = SearchBoard.from_state(state)
+        layout = blocked_layout(state.blocked)
+        players = {board.color: state.current, -board.color: state.other}
+        self.game = {'format': GAME_FORMAT, 'version': RECORD_VERSION, 'layout': layout,
+                     'black': type(players[BLACK]).__name__, 'white': type(players[WHITE]).__name__,
+                     'moves': [], 'seconds': [], 'nodes': []}
+        if layout is None or board.position() != (*initial_bitboards(*layout), BLACK, 0):
+            self.game['start'] = list(board.position())
+        self.game.update(self.info)
+
+    def finish(self, state):
+        record = self.game
+        record['winner'] = winner(state)
+        record['black_discs'] = state.black_count
+        record['white_discs'] = state.white_count
+        self.games.append(record)
+        self.game = None
+        if self.sink is not None:
+            self.sink.write(json.dumps(record) + '\n')
+            self.sink.flush()
+
+    def close(self):
+        if self.owns_sink:
+            self.sink.close()
+
+def read_records(path, kind):
+    '''The JSON lines of a file written by GameRecorder (kind GAME_FORMAT) or write_corpus'''
+    records = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict) or record.get('format') != kind or record.get('version') != RECORD_VERSION:
+                raise ValueError("%s is not a version %d %s file" % (path, RECORD_VERSION, kind))
+            records.append(record)
+    return records
+
+def read_games(path):
+    return read_records(path, GAME_FORMAT)
+
+def game_positions(record):
+    '''Every position of a recorded game before each move, as from SearchBoard.position()
+
+    Raises ValueError if the record holds an illegal move.
+    '''
+    if 'start' in record:
+        board = SearchBoard(*record['start'])
+    else:
+        board = SearchBoard(*initial_bitboards(*record['layout']), BLACK)
+    positions = []
+    for move in record['moves']:
+        if move not in board.moves():
+            raise ValueError("illegal move %r after %d moves" % (to_action(move), len(positions)))
+        positions.append(board.position())
+        board.apply(move)
+    return positions
+
+def write_corpus(path, positions, **info):
+    '''Writes positions (as from SearchBoard.position()) as a benchmark corpus, one JSON line each'''
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        for i, position in enumerate(positions):
+            record = {'format': CORPUS_FORMAT, 'version': RECORD_VERSION, 'id': i, 'position': list(position)}
+            record.update(info)
+            f.write(json.dumps(record) + '\n')
+    os.replace(tmp, path)
+
+def read_corpus(path):
+    return [tuple(r['position']) for r in read_records(path, CORPUS_FORMAT)]
+
+def corpus_from_games(paths, n, seed = 5511):
+    '''n distinct positions, picked at random, in which the mover had a choice in the recorded games'''
+    found = {}
+    for path in paths:
+        for record in read_games(path):
+            for position in game_positions(record):
+                board = SearchBoard(*position)
+                if len(board.moves()) > 1:
+                    found.setdefault(board.hash, position)
+    positions = sorted(found.values())
+    return random.Random(seed).sample(positions, min(n, len(positions)))
+
+def benchmark(positions, spec, seed = 0, stats_path = None):
+    '''Searches every position with a fresh player made from spec and times each depth
+
+    Each position gets new players (so nothing is carried over from the
+    previous one in a transposition table) and random is reseeded with
+    seed first, so a run can be repeated exactly. Returns one row per
+    position with the source, depth, nodes and seconds of the move and the
+    time and nodes its search took to finish each depth; the full
+    SearchStats records go to stats_path as JSON lines, if given. Players
+    that take no stats argument (see takes_stats) are only timed: their
+    rows have source, depth and nodes None and no depths.
+    '''
+    stats = SearchStats(stats_path)
+    extra = {'stats': stats} if takes_stats(spec) else {}
+    rows = []
+    try:
+        for i, (white, black, blocked, color, num_skips) in enumerate(positions):
+            random.seed(seed)
+            me = make_player(spec, color, **extra)
+            state = RandOthelloState(me, OthelloPlayerTemplate(-color), num_skips = num_skips,
+                                     bitboards = (white, black, blocked))
+            t0 = time.perf_counter()
+            try:
+                me.make_move(state)
+            finally:
+                if hasattr(me, 'close'):
+                    me.close()
+            if not extra:
+                rows.append({'id': i, 'source': None, 'depth': None, 'nodes': None,
+                             'seconds': time.perf_counter() - t0, 'to_depth': {}})
+                continue
+            m = stats.moves[-1]
+            to_depth = {}
+            seconds = nodes = 0
+            for it in m['iterations']:
+                seconds += it['seconds']
+                nodes += it['nodes']
+                to_depth[it['depth']] = (seconds, nodes)
+            rows.append({'id': i, 'source': m['source'], 'depth': m['depth'], 'nodes': m['nodes'],
+                         'seconds': m['seconds'], 'to_depth': to_depth})
+    finally:
+        stats.close()
+    return rows
+
+def print_benchmark(spec, rows):
+    seconds = sum(r['seconds'] for r in rows)
+    if any(r['nodes'] is None for r in rows):
+        print("%s: %d positions in %.2fs (nodes/s n/a)" % (spec, len(rows), seconds))
+        return
+    nodes = sum(r['nodes'] for r in rows)
+    print("%s: %d positions, %d nodes in %.2fs (%.0f nodes/s)" % (
+        spec, len(rows), nodes, seconds, nodes / seconds if seconds else 0))
+    sources = {}
+    for r in rows:
+        sources[r['source']] = sources.get(r['source'], 0) + 1
+    print("    moves by source: " + ', '.join("%s %d" % kv for kv in sorted(sources.items())))
+    depths = sorted(set(d for r in rows for d in r['to_depth']))
+    for d in depths:
+        reached = [r['to_depth'][d] for r in rows if d in r['to_depth']]
+        times = sorted(t for t, n in reached)
+        print("    depth %2d: reached in %3d positions, time p50 %.4fs p90 %.4fs, mean nodes %.0f" % (
+            d, len(reached), percentile(times, 50), percentile(times, 90),
+            sum(n for t, n in reached) / len(reached)))
+
+# ---------- Weight tuning ----------
+
+WEIGHTS_SCALE = 100  # tuned weights are in hundredths of a logit of the win probability
+
+def square_class(x, y):
+    '''The square's class under the board's symmetries, as (distance to the nearer edge, to the other one)'''
+    a, b = min(x, SIZE - 1 - x), min(y, SIZE - 1 - y)
+    return min(a, b), max(a, b)
+
+SQUARE_CLASSES = sorted({square_class(x, y) for x, y in SQUARES})
+CLASS_MASKS = [sum(1 << sq for sq, (x, y) in enumerate(SQUARES) if square_class(x, y) == c)
+               for c in SQUARE_CLASSES]
+
+def position_features(own, opp, blocked):
+    '''weighted_frontier's terms for the owner of own: disc difference per square class, mobility, frontier'''
+    features = [popcount(own & mask) - popcount(opp & mask) for mask in CLASS_MASKS]
+    features.append(max(popcount(legal_moves(own, opp, blocked)), 1)
+                    - max(popcount(legal_moves(opp, own, blocked)), 1))
+    edge = neighbours(FULL & ~(own | opp | blocked))
+    features.append(popcount(own & edge) - popcount(opp & edge))
+    return features
+
+def weights_features(weights):
+    '''The coefficients of position_features that reproduce weighted_frontier with weights'''
+    by_class = {}
+    for x, y in SQUARES:
+        by_class[square_class(x, y)] = weights.squares[x][y]
+    return [by_class[c] for c in SQUARE_CLASSES] + [weights.mobility, -weights.frontier]
+
+def _selfplay_game(job):
+    '''One self-play game; returns [(features, result)] for the positions the mover had a choice in
+
+    result is 1, 0.5 or 0 for the side to move in that position. Positions
+    with fewer than min_empties empty squares are left out.
+    '''
+    seed, depth, epsilon, min_empties = job
+    rng = random.Random(seed)
+    board = SearchBoard(*initial_bitboards(rng.randrange(SIZE), rng.randrange(SIZE)), BLACK)
+    players = {c: AlphabetaPlayer(c, depth_limit=depth, time_budget=None, endgame_empties=0) for c in (WHITE, BLACK)}
+    seen = []
+    while not terminal_test(board):
+        legals = board.moves()
+        if len(legals) > 1 and board.empties >= min_empties:
+            own, opp = own_and_opp(board, board.color)
+            seen.append((board.color, position_features(own, opp, board.blocked)))
+            if rng.random() < epsilon:
+                move = rng.choice(legals)
+            else:
+                searcher = players[board.color]
+                searcher.start_search()
+                done, val, move = searcher.iterative_deepening(board, legals)
+        else:
+            move = legals[0]
+        board.apply(move)
+    diff = popcount(board.white) - popcount(board.black)
+    white_result = 1.0 if diff > 0 else 0.0 if diff < 0 else 0.5
+    return [(features, white_result if color == WHITE else 1.0 - white_result) for color, features in seen]
+
+def selfplay_positions(games, depth = 2, epsilon = 0.1, processes = None, seed = 0, min_empties = ENDGAME_EMPTIES + 1):
+    '''Labelled positions from games between depth-limited AlphabetaPlayers across a process pool
+
+    epsilon is the chance of a random move instead of the searched one,
+    which keeps the games apart. By default positions the endgame solver
+    would take over from the evaluation are not kept.
+    '''
+    jobs = [(seed + g, depth, epsilon, min_empties) for g in range(games)]
+    samples = []
+    with ProcessPoolExecutor(processes) as executor:
+        for game in executor.map(_selfplay_game, jobs, chunksize=8):
+            samples.extend(game)
+    return samples
+
+def sigmoid(z):
+    if z < -500:
+        return 0.0
+    return 1 / (1 + math.exp(-z))
+
+def log_loss(samples, theta):
+    '''Mean cross-entropy of the results against sigmoid(theta . features)'''
+    total = 0.0
+    for x, y in samples:
+        p = min(max(sigmoid(sum(t * f for t, f in zip(theta, x))), 1e-12), 1 - 1e-12)
+        total -= y * math.log(p) + (1 - y) * math.log(1 - p)
+    return total / len(samples)
+
+def solve_linear(a, b):
+    '''Solves a x = b by Gaussian elimination with partial pivoting (a and b are overwritten)'''
+    n = len(b)
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        a[col], a[pivot] = a[pivot], a[col]
+        b[col], b[pivot] = b[pivot], b[col]
+        for r in range(col + 1, n):
+            k = a[r][col] / a[col][col]
+            for c in range(col, n):
+                a[r][c] -= k * a[col][c]
+            b[r] -= k * b[col]
+    x = [0.0] * n
+    for r in reversed(range(n)):
+        x[r] = (b[r] - sum(a[r][c] * x[c] for c in range(r + 1, n))) / a[r][r]
+    return x
+
+def fit_logistic(samples, l2 = 1.0, iterations = 25, theta = None):
+    '''Logistic regression of results on features by Newton's method
+
+    No intercept, since the evaluation is antisymmetric. l2 is a ridge
+    penalty that keeps rarely seen features (the centre squares) in check.
+    Returns the coefficients, in logits per unit of each feature.
+    '''
+    n = len(samples[0][0])
+    theta = list(theta) if theta else [0.0] * n
+    for it in range(iterations):
+        grad = [l2 * t for t in theta]
+        hess = [[l2 if i == j else 0.0 for j in range(n)] for i in range(n)]
+        for x, y in samples:
+            p = sigmoid(sum(t * f for t, f in zip(theta, x)))
+            r = p - y
+            w = p * (1 - p)
+            for i in range(n):
+                if x[i]:
+                    grad[i] += r * x[i]
+                    wx = w * x[i]
+                    row = hess[i]
+                    for j in range(n):
+                        row[j] += wx * x[j]
+        step = solve_linear(hess, grad)
+        theta = [t - s for t, s in zip(theta, step)]
+        if max(abs(s) for s in step) < 1e-7:
+            break
+    return theta
+
+def weights_from_theta(theta, scale = WEIGHTS_SCALE):
+    '''EvalWeights from fitted position_features coefficients, rounded to integers'''
+    by_class = dict(zip(SQUARE_CLASSES, theta))
+    squares = [[round(by_class[square_class(x, y)] * scale) for y in range(SIZE)] for x in range(SIZE)]
+    return EvalWeights(squares, round(theta[-2] * scale), -round(theta[-1] * scale))
+
+def tune_weights(path, games = 1000, depth = 2, epsilon = 0.1, processes = None, seed = 0, holdout = 0.1,
+                 min_empties = ENDGAME_EMPTIES + 1):
+    '''Fits the evaluation weights to self-play results and writes them to path
+
+    Positions come from selfplay_positions, labelled with each game's
+    outcome for the side to move (Texel-style tuning). The square weights
+    (one per symmetry class) and the mobility and frontier multipliers are
+    fitted by logistic regression on all but a holdout fraction of the
+    positions, which is kept to compare the tuned weights against the
+    current defaults (with their best single scale). Returns the new
+    EvalWeights and the info dict saved with them.
+    '''
+    samples = selfplay_positions(games, depth, epsilon, processes, seed, min_empties)
+    random.Random(seed).shuffle(samples)
+    cut = int(len(samples) * holdout)
+    test, train = samples[:cut], samples[cut:]
+    theta = fit_logistic(train)
+    weights = weights_from_theta(theta)
+    # the defaults, scaled by the single factor that fits them best
+    base = weights_features(DEFAULT_WEIGHTS)
+    k = fit_logistic([([sum(b * f for b, f in zip(base, x))], y) for x, y in train], l2 = 0.0)[0]
+    tuned = [w / WEIGHTS_SCALE for w in weights_features(weights)]
+    info = {'games': games, 'depth': depth, 'epsilon': epsilon, 'seed': seed, 'min_empties': min_empties,
+            'positions': len(train), 'holdout_positions': len(test),
+            'holdout_loss': log_loss(test, tuned) if test else None,
+            'default_holdout_loss': log_loss(test, [k * b for b in base]) if test else None}
+    weights.save(path, **info)
+    return weights, info
+
+# ---------- Command line ----------
+
+import argparse
+
 def main():
-    auto_match()
-   
-    # play_game(HumanPlayer(BLACK), HumanPlayer(WHITE), show=True)
+    if len(sys.argv) == 1:
+        auto_match()
+
+        # play_game(HumanPlayer(BLACK), HumanPlayer(WHITE), show=True)
 
-     # To play manually, comment auto_match() and uncomment the above line
+         # To play manually, comment auto_match() and uncomment the above line
+
+        # parallel_speedup_report(AlphabetaPlayer, depth=6, mode='split')
+        # parallel_speedup_report(AlphabetaPlayer, depth=6, mode='lazy')
+        # pruning_report(depth=4)
+        return
+
+    parser = argparse.ArgumentParser(description="RandOthello tools (run with no arguments for the demo matches)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    t = commands.add_parser('tournament', help="self-play games between player specs")
+    t.add_argument('--pair', nargs=2, action='append', required=True, metavar=('SPEC_A', 'SPEC_B'),
+                   help='players such as "AlphabetaPlayer:depth_limit=4" (repeatable)')
+    t.add_argument('--games', type=int, default=100, help="games per pairing")
+    t.add_argument('--processes', type=int, default=None)
+    t.add_argument('--seed', type=int, default=0)
+    t.add_argument('--json', dest='json_path')
+    t.add_argument('--csv', dest='csv_path')
+    t.add_argument('--record', dest='record_path', help="append the game records to this file")
+    b = commands.add_parser('book', help="build an opening book for every blocked layout")
+    b.add_argument('path', help="book file to write")
+    b.add_argument('--plies', type=int, default=6, help="book covers positions up to this many plies in")
+    b.add_argument('--depth', type=int, default=5, help="search depth for each book position")
+    b.add_argument('--processes', type=int, default=None)
+    w = commands.add_parser('tune', help="fit the evaluation weights to self-play games")
+    w.add_argument('path', help="weights file to write")
+    w.add_argument('--games', type=int, default=1000)
+    w.add_argument('--depth', type=int, default=2, help="search depth of the self-play players")
+    w.add_argument('--epsilon', type=float, default=0.1, help="chance of a random move instead")
+    w.add_argument('--processes', type=int, default=None)
+    w.add_argument('--seed', type=int, default=0)
+    w.add_argument('--holdout', type=float, default=0.1, help="fraction of the positions kept back to score the fit")
+    w.add_argument('--min-empties', type=int, default=ENDGAME_EMPTIES + 1,
+                   help="leave out positions with fewer empty squares")
+    c = commands.add_parser('corpus', help="write a fixed set of benchmark positions")
+    c.add_argument('path', help="corpus file to write")
+    c.add_argument('--games', nargs='+', metavar='RECORDS', help="take the positions from recorded games")
+    c.add_argument('--positions', type=int, default=50)
+    c.add_argument('--seed', type=int, default=5511)
+    r = commands.add_parser('bench', help="search every position of a corpus and time each depth")
+    r.add_argument('corpus')
+    r.add_argument('--player', action='append', required=True, metavar='SPEC',
+                   help='such as "AlphabetaPlayer:depth_limit=6,time_budget=None" (repeatable)')
+    r.add_argument('--seed', type=int, default=0)
+    r.add_argument('--stats', dest='stats_path', help="append every move's SearchStats record to this file")
+    args = parser.parse_args()
+
+    if args.command == 'tournament':
+        for spec in sum(args.pair, []):
+            try:
+                parse_player_spec(spec)
+            except (ValueError, SyntaxError) as e:
+                parser.error("bad player spec %r: %s" % (spec, e))
+        print_tournament(run_tournament([tuple(p) for p in args.pair], args.games, args.processes,
+                                        args.seed, args.json_path, args.csv_path, args.record_path))
+    elif args.command == 'book':
+        t0 = time.perf_counter()
+        n = build_book(args.path, args.plies, args.depth, args.processes)
+        print("%d positions written to %s in %.1fs" % (n, args.path, time.perf_counter() - t0))
+    elif args.command == 'corpus':
+        if args.games:
+            positions = corpus_from_games(args.games, args.positions, args.seed)
+            write_corpus(args.path, positions, seed=args.seed, games=args.games)
+        else:
+            positions = sample_positions(args.positions, args.seed)
+            write_corpus(args.path, positions, seed=args.seed)
+        print("%d positions written to %s" % (len(positions), args.path))
+    elif args.command == 'bench':
+        for spec in args.player:
+            try:
+                parse_player_spec(spec)
+            except (ValueError, SyntaxError) as e:
+                parser.error("bad player spec %r: %s" % (spec, e))
+        positions = read_corpus(args.corpus)
+        for spec in args.player:
+            print_benchmark(spec, benchmark(positions, spec, args.seed, args.stats_path))
+    elif args.command == 'tune':
+        weights, info = tune_weights(args.path, args.games, args.depth, args.epsilon, args.processes,
+                                     args.seed, args.holdout, min_empties=args.min_empties)
+        def loss(value):
+            return 'n/a' if value is None else '%.4f' % value
+        print("fitted on %d positions; holdout log loss %s (defaults %s)" % (
+            info['positions'], loss(info['holdout_loss']), loss(info['default_holdout_loss'])))
+        for row in weights.squares:
+            print(' '.join('%4d' % w for w in row))
+        print("mobility %d, frontier %d; written to %s" % (weights.mobility, weights.frontier, args.path))
 
 if __name__ == '__main__':
     main()
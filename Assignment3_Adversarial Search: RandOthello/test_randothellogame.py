@@ -0,0 +1,50 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+@pytest.fixture(scope='module')
+def game():
+    spec = importlib.util.spec_from_file_location('randothellogame', os.path.join(HERE, 'randothellogame .py'))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module  # so worker processes can unpickle its functions
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.mark.parametrize('spec', ['MCTSPlayer:time_budget=0.02,seed=1', 'RandomPlayer'])
+def test_benchmark_times_players_without_stats(game, spec, capsys):
+    positions = game.sample_positions(3)
+    rows = game.benchmark(positions, spec)
+    assert len(rows) == 3
+    assert all(r['nodes'] is None and r['seconds'] >= 0 for r in rows)
+    game.print_benchmark(spec, rows)
+    assert 'nodes/s n/a' in capsys.readouterr().out
+
+
+def test_benchmark_counts_nodes_with_stats(game):
+    rows = game.benchmark(game.sample_positions(2), 'AlphabetaPlayer:depth_limit=2,time_budget=None')
+    assert all(r['nodes'] > 0 and r['depth'] == 2 for r in rows)
+
+
+def test_pondering_moves_stay_within_time_budget(game):
+    game.random.seed(3)
+    budget = 0.1
+    me = game.AlphabetaPlayer(game.BLACK, depth_limit=60, time_budget=budget, ponder=True)
+    state = game.RandOthelloState(me, game.RandomPlayer(game.WHITE))
+    latencies = []
+    try:
+        while not game.terminal_test(state):
+            mover = state.current
+            t0 = game.time.perf_counter()
+            action = mover.make_move(state)
+            if mover is me:
+                latencies.append(game.time.perf_counter() - t0)
+            state = game.result(state, action)
+    finally:
+        me.close()
+    assert latencies and max(latencies) < budget